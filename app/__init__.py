@@ -1,3 +1,5 @@
-from dotenv import load_dotenv
+import time
 
-load_dotenv()
\ No newline at end of file
+# เวลาเริ่ม import แพ็กเกจ ใช้วัดเวลา startup (ดู app.startup)
+# ค่าใน .env โหลดที่ app.config ที่เดียว
+STARTED_AT = time.perf_counter()
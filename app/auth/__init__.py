@@ -1,3 +1,4 @@
-from .handler_auth import get_password_hash, verify_password
-from .token__auth import create_access_token, get_current_user, oauth2_scheme
-from .token__utils import create_access_token, decode_access_token
+from .handler_auth import get_password_hash, verify_password, hash_password_async, verify_password_async, reserve_bulk_hashes, release_bulk_hashes
+from .token__cache import CurrentUser, invalidate_user
+from .token__service import create_access_token, decode_access_token, revocation_index
+from .token__auth import get_admin_user, get_current_user, oauth2_scheme
@@ -1,9 +1,120 @@
-from passlib.context import CryptContext
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from fastapi import HTTPException, status
+
+from app.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT, BULK_HASH_WORKERS, BULK_HASH_QUEUE_LIMIT
+from app.metrics import observe_password_hash
+
+_pwd_context = None
+_pwd_context_lock = threading.Lock()
+
+def get_pwd_context():
+    """CryptContext ที่สร้างครั้งแรกที่ใช้ (passlib + bcrypt import ช้า จึงไม่ทำตอน startup)"""
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+
+                # min/max rounds เท่ากับ cost ที่ตั้งไว้ ทำให้ hash ที่ cost ต่างออกไปถูกมองว่า deprecated
+                # และถูก rehash ตอน login (ดู verify_password_async)
+                _pwd_context = CryptContext(
+                    schemes=["bcrypt"],
+                    deprecated="auto",
+                    bcrypt__default_rounds=BCRYPT_ROUNDS,
+                    bcrypt__min_rounds=BCRYPT_ROUNDS,
+                    bcrypt__max_rounds=BCRYPT_ROUNDS,
+                )
+    return _pwd_context
+
+def __getattr__(name):
+    # ชื่อเดิม handler_auth.pwd_context
+    if name == "pwd_context":
+        return get_pwd_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# bcrypt ปล่อย GIL ระหว่างคำนวณ thread pool จึงใช้ได้ทุก core โดยไม่ต้อง pickle ข้ามโปรเซส
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_pending = 0
+_pending_lock = threading.Lock()
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+def _timed(operation, fn, *args):
+    # จับเวลาใน worker thread จึงไม่รวมเวลาที่รอคิว
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        observe_password_hash(operation, time.perf_counter() - start)
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+async def _run_in_pool(operation, fn, *args):
+    global _pending
+    with _pending_lock:
+        if _pending >= PASSWORD_HASH_QUEUE_LIMIT:
+            raise _busy()
+        _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, _timed, operation, fn, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_pool("hash", get_pwd_context().hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str):
+    """คืนค่า (ถูกต้องหรือไม่, hash ใหม่ถ้าควร rehash หรือ None)"""
+    return await _run_in_pool("verify", get_pwd_context().verify_and_update, plain_password, hashed_password)
+
+# การสมัครทีละมากๆ ใช้ pool แยก (BULK_HASH_WORKERS) จึงไม่แย่ง thread ของ login/register ปกติ
+_bulk_executor = None
+_bulk_reserved = 0
+
+def _get_bulk_executor():
+    global _bulk_executor
+    if _bulk_executor is None:
+        with _pwd_context_lock:
+            if _bulk_executor is None:
+                _bulk_executor = ThreadPoolExecutor(max_workers=BULK_HASH_WORKERS, thread_name_prefix="bcrypt-bulk")
+    return _bulk_executor
+
+def hash_passwords(passwords, executor) -> list:
+    """hash หลายรหัสผ่านพร้อมกันบน executor ที่ส่งมา (ใช้จาก app.cli)"""
+    hash_fn = get_pwd_context().hash
+    return list(executor.map(lambda password: _timed("hash", hash_fn, password), passwords))
+
+def reserve_bulk_hashes(count: int) -> None:
+    """จองที่ hash พร้อมกัน count รหัสผ่าน (หนึ่งชุดของการสมัครทีละมากๆ) เกิน BULK_HASH_QUEUE_LIMIT ตอบ 503"""
+    global _bulk_reserved
+    with _pending_lock:
+        if _bulk_reserved + count > BULK_HASH_QUEUE_LIMIT:
+            raise _busy()
+        _bulk_reserved += count
+
+def release_bulk_hashes(count: int) -> None:
+    global _bulk_reserved
+    with _pending_lock:
+        _bulk_reserved -= count
+
+async def hash_passwords_async(passwords) -> list:
+    """hash หลายรหัสผ่านบน pool ของการสมัครทีละมากๆ (ผู้เรียกจองที่ด้วย reserve_bulk_hashes ไว้แล้ว)"""
+    loop = asyncio.get_running_loop()
+    hash_fn = get_pwd_context().hash
+    return await asyncio.gather(*(
+        loop.run_in_executor(_get_bulk_executor(), _timed, "hash", hash_fn, password) for password in passwords
+    ))
@@ -1,55 +1,50 @@
-from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from typing import Optional
 from app.schemas import TokenData
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from app.database import SessionLocal
+from sqlalchemy.orm import Session
+from app.config import ADMIN_USERNAMES
+from app.database import get_session
 from app.models import User
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+from app.auth.token__cache import CurrentUser, token_cache
+from app.auth.token__service import decode_token, revocation_index
 
 # สำหรับ Swagger UI ใช้ auth แบบ OAuth2 (token bearer)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+def _find_user(db: Session, username: str):
+    return db.query(User).filter(User.username == username).first()
 
 # ใช้ตรวจสอบ token และดึง user ปัจจุบัน
-def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(SessionLocal)):
+# token ที่เคยตรวจแล้วจะอ่านจาก token_cache โดยไม่ต้อง decode หรือ query ซ้ำ
+async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_session)):
+    cached = token_cache.get(token)
+    # token ที่อยู่ใน cache อาจถูกเพิกถอนภายหลัง (dict lookup ครั้งเดียว)
+    if cached is not None and not revocation_index.is_revoked(cached[0].get("jti")):
+        return cached[1]
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-
-        if username is None:
-            raise credentials_exception
-
-        token_data = TokenData(username=username)
-
-    except JWTError:
+    # ตรวจลายเซ็น อายุ ประเภท (ไม่รับ refresh token) และการเพิกถอน
+    payload = decode_token(token)
+    if payload is None:
         raise credentials_exception
+    token_data = TokenData(username=payload["sub"])
 
-    user = db.query(User).filter(User.username == token_data.username).first()
+    user = await db.run_sync(_find_user, token_data.username)
 
     if user is None:
         raise credentials_exception
 
-    return user
+    current_user = CurrentUser.from_model(user)
+    token_cache.put(token, payload, current_user)
+    return current_user
+
+# สำหรับ endpoint ของผู้ดูแล (username อยู่ใน ADMIN_USERNAMES)
+async def get_admin_user(current_user: CurrentUser = Depends(get_current_user)):
+    if current_user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
@@ -0,0 +1,80 @@
+"""cache ของ JWT ที่ถอดรหัสและตรวจลายเซ็นแล้ว
+
+key คือ sha256 ของ token (ไม่เก็บ token ดิบไว้ในหน่วยความจำ) และแต่ละรายการ
+หมดอายุไม่เกิน exp ของ token เอง
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.config import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """ข้อมูลผู้ใช้แบบย่อที่ไม่ผูกกับ Session"""
+    id: int
+    username: str
+    fullname: str
+    phone: str
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(id=user.id, username=user.username, fullname=user.fullname, phone=user.phone)
+
+
+class TokenCache:
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # digest -> (expires_at, claims, user)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        """คืน (claims, user) หรือ None ถ้าไม่มี/หมดอายุ"""
+        digest = self._digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            with self._lock:
+                self._entries.pop(digest, None)
+            return None
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+        return entry[1], entry[2]
+
+    def put(self, token: str, claims: dict, user: CurrentUser) -> None:
+        expires_at = time.time() + self.ttl
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+        digest = self._digest(token)
+        with self._lock:
+            self._entries[digest] = (expires_at, claims, user)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, username: str) -> None:
+        """ลบทุก token ของผู้ใช้ ใช้เมื่อข้อมูลผู้ใช้เปลี่ยนหรือถูกลบ"""
+        with self._lock:
+            for digest in [d for d, entry in self._entries.items() if entry[2].username == username]:
+                del self._entries[digest]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(username: str) -> None:
+    token_cache.invalidate_user(username)
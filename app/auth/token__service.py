@@ -0,0 +1,203 @@
+"""ออกและตรวจ token ทั้งหมดของระบบ
+
+- access token: JWT อายุสั้น (ACCESS_TOKEN_EXPIRE_MINUTES) มี jti สำหรับเพิกถอน
+- refresh token: JWT อายุ REFRESH_TOKEN_EXPIRE_DAYS ที่ใช้ได้ครั้งเดียว แต่ละใบมีแถวใน
+  refresh_tokens การแลก (POST /token/refresh) ได้คู่ใหม่ใน family เดิมโดยไม่ต้องใช้ bcrypt
+  ถ้าใบที่แลกไปแล้วถูกนำมาใช้อีก (token รั่ว) ทั้ง family ถูกเพิกถอน
+- การเพิกถอน access token เก็บ jti ใน revoked_tokens และใน revocation_index ของแต่ละ worker
+  (ตรวจด้วย dict lookup ครั้งเดียวต่อ request) worker อื่นโหลดใหม่ผ่าน app.cache_sync
+"""
+import heapq
+import threading
+import time
+import uuid
+from datetime import timedelta
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app import cache_sync
+from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+from app.models import RefreshToken, RevokedToken
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+
+def _encode(claims: dict) -> str:
+    from jose import jwt  # import ตอนใช้ครั้งแรก ไม่ให้ถ่วงเวลา startup
+
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def decode_token(token: str, token_type: str = ACCESS) -> Optional[dict]:
+    """claims ของ token ที่ลายเซ็นถูก ยังไม่หมดอายุ ถูกประเภท และไม่ถูกเพิกถอน ไม่เช่นนั้น None
+
+    token ที่ไม่มี typ (ออกก่อนมี refresh token) ถือเป็น access token
+    """
+    from jose import JWTError, jwt
+
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if claims.get("typ", ACCESS) != token_type or claims.get("sub") is None:
+        return None
+    if token_type == ACCESS and revocation_index.is_revoked(claims.get("jti")):
+        return None
+    return claims
+
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    return _access_token(data, expires_delta)[0]
+
+
+def _access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    """คืน (token, jti, exp เป็น unix time)"""
+    expire = int(time.time() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)).total_seconds())
+    jti = uuid.uuid4().hex
+    return _encode({**data, "exp": expire, "jti": jti, "typ": ACCESS}), jti, expire
+
+
+def decode_access_token(token: str) -> Optional[str]:
+    """username ของ access token ที่ใช้ได้ หรือ None"""
+    claims = decode_token(token)
+    return claims["sub"] if claims else None
+
+
+class RevocationIndex:
+    """jti ที่ถูกเพิกถอนแต่ยังไม่หมดอายุ
+
+    เก็บเป็น bytes 16 ตัว (uuid) -> เวลาหมดอายุ ใน dict ตรวจได้ O(1) ส่วน heap ตามลำดับ
+    เวลาหมดอายุใช้ลบรายการที่หมดอายุแล้ว (token เหล่านั้นถูกปฏิเสธจาก exp อยู่แล้ว)
+    """
+
+    def __init__(self):
+        self._expires = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(jti: str) -> bytes:
+        try:
+            return bytes.fromhex(jti)
+        except ValueError:
+            return jti.encode()
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        return jti is not None and self._key(jti) in self._expires
+
+    def add(self, jti: str, expires_at: int) -> None:
+        key = self._key(jti)
+        with self._lock:
+            self._sweep(time.time())
+            if key not in self._expires:
+                self._expires[key] = expires_at
+                heapq.heappush(self._heap, (expires_at, key))
+
+    def _sweep(self, now: float) -> None:
+        while self._heap and self._heap[0][0] <= now:
+            _, key = heapq.heappop(self._heap)
+            self._expires.pop(key, None)
+
+    def replace(self, entries) -> None:
+        """แทนที่ทั้งหมดด้วย (jti, expires_at) ที่โหลดจากฐานข้อมูล"""
+        now = time.time()
+        expires = {self._key(jti): expires_at for jti, expires_at in entries if expires_at > now}
+        heap = [(expires_at, key) for key, expires_at in expires.items()]
+        heapq.heapify(heap)
+        with self._lock:
+            self._expires, self._heap = expires, heap
+
+    def load(self, db: Session) -> None:
+        rows = db.execute(select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > time.time()))
+        self.replace(rows.all())
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def clear(self) -> None:
+        self.replace(())
+
+
+revocation_index = RevocationIndex()
+cache_sync.cache_versions.watch("revocations", revocation_index.load)
+
+
+def _unauthorized(detail: str = "Invalid refresh token") -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def issue_tokens(db: Session, username: str, family: Optional[str] = None) -> dict:
+    """ออก access + refresh token คู่ใหม่และบันทึก refresh token (เรียกผ่าน run_write)"""
+    now = int(time.time())
+    if family is None:
+        family = uuid.uuid4().hex
+        # login ใหม่: ลบ refresh token ที่หมดอายุของผู้ใช้นี้ ตารางจึงไม่โตไปเรื่อยๆ
+        db.execute(delete(RefreshToken).where(RefreshToken.username == username, RefreshToken.expires_at <= now))
+    access_token, access_jti, access_expires_at = _access_token({"sub": username})
+    refresh_jti = uuid.uuid4().hex
+    refresh_expires_at = now + int(REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+    refresh_token = _encode({"sub": username, "exp": refresh_expires_at, "jti": refresh_jti, "fam": family, "typ": REFRESH})
+    db.add(RefreshToken(
+        jti=refresh_jti, family=family, username=username, expires_at=refresh_expires_at,
+        access_jti=access_jti, access_expires_at=access_expires_at,
+    ))
+    db.commit()
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": access_expires_at - now,
+        "refresh_token": refresh_token,
+    }
+
+
+def revoke_family(db: Session, family: str) -> None:
+    """เพิกถอน refresh token ทุกใบใน family และ access token ที่ออกคู่กันซึ่งยังไม่หมดอายุ (ไม่ commit)"""
+    now = int(time.time())
+    rows = db.execute(
+        select(RefreshToken.access_jti, RefreshToken.access_expires_at)
+        .where(RefreshToken.family == family, RefreshToken.access_expires_at > now)
+    ).all()
+    db.execute(update(RefreshToken).where(RefreshToken.family == family).values(revoked=1))
+    db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+    db.add_all(RevokedToken(jti=jti, expires_at=expires_at) for jti, expires_at in rows)
+    cache_sync.bump(db, "revocations")
+    db.info.setdefault("revoked_jtis", []).extend(rows)
+
+
+def _apply_local_revocations(db: Session) -> None:
+    # เรียกหลัง commit: worker นี้เห็นการเพิกถอนทันทีโดยไม่ต้องรอ poll
+    for jti, expires_at in db.info.pop("revoked_jtis", ()):
+        revocation_index.add(jti, expires_at)
+
+
+def rotate_refresh_token(db: Session, refresh_token: str) -> dict:
+    """แลก refresh token เป็นคู่ใหม่ (เรียกผ่าน run_write) ใบที่เคยแลกแล้วทำให้ทั้ง family ถูกเพิกถอน"""
+    claims = decode_token(refresh_token, REFRESH)
+    if claims is None:
+        raise _unauthorized()
+    row = db.get(RefreshToken, claims["jti"])
+    if row is None or row.revoked:
+        raise _unauthorized()
+    used = db.execute(
+        update(RefreshToken).where(RefreshToken.jti == row.jti, RefreshToken.used == 0).values(used=1)
+    ).rowcount
+    if not used:
+        revoke_family(db, row.family)
+        db.commit()
+        _apply_local_revocations(db)
+        raise _unauthorized("Refresh token reuse detected, please log in again")
+    return issue_tokens(db, row.username, row.family)
+
+
+def revoke_refresh_token(db: Session, refresh_token: str) -> None:
+    """logout: เพิกถอน family ของ refresh token นี้ (เรียกผ่าน run_write)"""
+    claims = decode_token(refresh_token, REFRESH)
+    if claims is None:
+        raise _unauthorized()
+    revoke_family(db, claims["fam"])
+    db.commit()
+    _apply_local_revocations(db)
@@ -0,0 +1,248 @@
+"""นำเข้าข้อมูล tax/travel ทีละมากๆ แบบ upsert (ใช้ทั้ง endpoint /bulk และ app.cli)
+
+ข้อมูลเข้ามาเป็นบรรทัด (CSV ที่มี header หรือ NDJSON) และถูกส่งให้ BulkImporter.feed
+ทีละชุด แต่ละชุดจะถูก validate ด้วย schema แล้ว upsert ด้วย INSERT ... ON CONFLICT
+แบบ executemany คำสั่งเดียว
+"""
+import csv
+import json
+import tempfile
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.datastructures import UploadFile
+
+from app import cache_sync, stats
+from app.database import dialect_insert, run_write, write_lock
+
+FORMATS = ("csv", "ndjson")
+INVALID_UTF8 = "Invalid UTF-8 (save the file as UTF-8, e.g. convert from TIS-620/cp874)"
+SPOOL_MEMORY_BYTES = 1024 * 1024
+
+
+def detect_format(content_type: str | None, default: str = "ndjson") -> str:
+    if content_type and "csv" in content_type:
+        return "csv"
+    if content_type and ("ndjson" in content_type or "json" in content_type):
+        return "ndjson"
+    return default
+
+
+def decode_line(line: bytes):
+    """str ของบรรทัด หรือ bytes เดิมถ้าไม่ใช่ UTF-8 (BulkImporter รายงานเป็น error ของแถวนั้น)"""
+    try:
+        return line.decode("utf-8")
+    except UnicodeDecodeError:
+        return line
+
+
+def upsert_statement(db, model, columns):
+    """INSERT ... ON CONFLICT (province) DO UPDATE ตาม dialect ของ session"""
+    stmt = dialect_insert(db)(model.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=["province"],
+        set_={column: stmt.excluded[column] for column in columns if column != "province"},
+    )
+
+
+class BulkImporter:
+    def __init__(self, model, schema, fmt: str = "ndjson", atomic: bool = False, on_commit=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.model = model
+        self.schema = schema
+        self.fmt = fmt
+        self.atomic = atomic
+        self.on_commit = on_commit
+        self.header = None
+        self.processed = 0
+        self.upserted = 0
+        self.committed = False
+        self.failed = False
+        self.errors = []
+
+    def _parse(self, lines):
+        """คืน list ของ (หมายเลขแถว, dict) ส่วนแถวที่อ่านไม่ได้จะถูกบันทึกใน errors
+
+        บรรทัดที่ไม่ใช่ UTF-8 (bytes จาก decode_line) ถูกรายงานเป็น error ของแถวนั้น
+        """
+        records, text = [], []
+        for line in lines:
+            if isinstance(line, bytes):
+                records.extend(self._parse_text(text))
+                text = []
+                if self.fmt == "csv" and self.header is None:
+                    # อ่าน header ไม่ได้: ทุกแถวถัดไปจะไม่ตรงกับ header ที่ว่างนี้
+                    self.header = []
+                    self.errors.append({"row": 0, "error": f"Header: {INVALID_UTF8}"})
+                else:
+                    self.processed += 1
+                    self.errors.append({"row": self.processed, "error": INVALID_UTF8})
+            else:
+                text.append(line)
+        records.extend(self._parse_text(text))
+        return records
+
+    def _parse_text(self, lines):
+        records = []
+        lines = [line.lstrip("\ufeff").rstrip("\r\n") for line in lines]
+        lines = [line for line in lines if line.strip()]
+        if self.fmt == "csv":
+            parsed = csv.reader(lines)
+            if self.header is None:
+                self.header = [name.strip() for name in next(parsed, [])]
+            for values in parsed:
+                self.processed += 1
+                if len(values) != len(self.header):
+                    self.errors.append({"row": self.processed, "error": "Column count does not match header"})
+                    continue
+                # ช่องว่างใน CSV = ไม่ระบุ ให้ schema ใช้ค่า default
+                records.append((self.processed, {k: v for k, v in zip(self.header, values) if v != ""}))
+        else:
+            for line in lines:
+                self.processed += 1
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    self.errors.append({"row": self.processed, "error": f"Invalid JSON: {e.msg}"})
+                    continue
+                if not isinstance(record, dict):
+                    self.errors.append({"row": self.processed, "error": "Expected a JSON object"})
+                    continue
+                records.append((self.processed, record))
+        return records
+
+    def _validate(self, records):
+        rows, row_numbers = [], []
+        for row_number, record in records:
+            try:
+                rows.append(self.schema.model_validate(record).model_dump())
+                row_numbers.append(row_number)
+            except ValidationError as e:
+                first = e.errors()[0]
+                field = ".".join(str(part) for part in first["loc"])
+                self.errors.append({"row": row_number, "error": f"{field}: {first['msg']}"})
+        return rows, row_numbers
+
+    def feed(self, db, lines) -> None:
+        """validate และ upsert หนึ่งชุด (เรียกผ่าน db.run_sync ได้)"""
+        if self.failed:
+            return
+        rows, row_numbers = self._validate(self._parse(lines))
+        if not rows:
+            return
+        try:
+            db.execute(upsert_statement(db, self.model, rows[0].keys()), rows)
+            # upsert อาจแก้แถวเดิม นับต่อทีละแถวไม่ได้ ให้ /stats สร้างตัวนับใหม่จากตาราง
+            stats.drop_counter(db, self.model.__tablename__)
+            cache_sync.bump(db, self.model.__tablename__)
+            if not self.atomic:
+                db.commit()
+                self._committed()
+            self.upserted += len(rows)
+        except SQLAlchemyError as e:
+            db.rollback()
+            message = f"Database error: {e.orig if getattr(e, 'orig', None) else e}"
+            self.errors.extend({"row": n, "error": message} for n in row_numbers)
+            if self.atomic:
+                # ทั้ง transaction ถูก rollback ไปแล้ว ไม่มีประโยชน์ที่จะทำต่อ
+                self.failed = True
+                self.upserted = 0
+
+    def finish(self, db) -> None:
+        """โหมด atomic: commit ครั้งเดียวถ้าไม่มีแถวผิดพลาด ไม่เช่นนั้น rollback ทั้งหมด"""
+        if not self.atomic:
+            return
+        if self.errors or self.failed:
+            db.rollback()
+            self.upserted = 0
+            return
+        db.commit()
+        self._committed()
+
+    def _committed(self) -> None:
+        self.committed = True
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def report(self) -> dict:
+        return {
+            "processed": self.processed,
+            "upserted": self.upserted,
+            "committed": self.committed,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
+
+
+async def iter_line_chunks(byte_stream, chunk_size: int):
+    """แบ่ง body ที่ stream เข้ามาเป็นชุดละ chunk_size บรรทัด โดยไม่อ่านทั้ง body เข้าหน่วยความจำ"""
+    buffer = b""
+    lines = []
+    async for data in byte_stream:
+        buffer += data
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            lines.append(decode_line(line))
+            if len(lines) >= chunk_size:
+                yield lines
+                lines = []
+    if buffer:
+        lines.append(decode_line(buffer))
+    if lines:
+        yield lines
+
+
+async def spool_body(byte_stream) -> UploadFile:
+    """อ่าน body ทั้งหมดลงไฟล์ชั่วคราว (เกิน SPOOL_MEMORY_BYTES จะลงดิสก์)
+
+    ใช้เมื่อต้องอ่าน body ให้จบก่อน: ก่อนถือ write lock และก่อนเริ่มตอบแบบ stream
+    (ระหว่างส่ง StreamingResponse, Starlette รอ http.disconnect จาก receive() ไปด้วย
+    เมื่อ ASGI spec ต่ำกว่า 2.4 เช่น uvicorn การอ่าน request.stream() ในตอนนั้นจึงค้าง)
+    """
+    file = UploadFile(tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES))
+    try:
+        async for data in byte_stream:
+            await file.write(data)
+        await file.seek(0)
+    except BaseException:
+        await file.close()
+        raise
+    return file
+
+
+async def iter_spooled(file: UploadFile, block_size: int = 64 * 1024):
+    while data := await file.read(block_size):
+        yield data
+
+
+async def import_stream(db, importer: BulkImporter, byte_stream, chunk_size: int) -> None:
+    """ป้อน body ที่ stream เข้ามาให้ importer ผ่าน db.run_sync
+
+    โหมด atomic ถือ write lock ตลอดทั้ง transaction จึงพัก body ลงไฟล์ก่อนขอ lock
+    (client ที่ upload ช้าไม่ทำให้งานเขียนอื่นต้องรอ) ส่วนโหมดปกติขอ lock ทีละ chunk
+    เพื่อไม่ให้การนำเข้าที่ยาวนานกันงานเขียนอื่น (เช่น /register) ไว้ทั้งหมด
+    """
+    if importer.atomic:
+        spooled = await spool_body(byte_stream)
+        try:
+            async with write_lock():
+                async for lines in iter_line_chunks(iter_spooled(spooled), chunk_size):
+                    await db.run_sync(importer.feed, lines)
+                await db.run_sync(importer.finish)
+        finally:
+            await spooled.close()
+        return
+    async for lines in iter_line_chunks(byte_stream, chunk_size):
+        await run_write(db, importer.feed, lines)
+
+
+def iter_file_chunks(file, chunk_size: int):
+    """เหมือน iter_line_chunks สำหรับไฟล์ที่เปิดแบบ binary ("rb")"""
+    lines = []
+    for line in file:
+        lines.append(decode_line(line))
+        if len(lines) >= chunk_size:
+            yield lines
+            lines = []
+    if lines:
+        yield lines
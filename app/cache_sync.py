@@ -0,0 +1,109 @@
+"""ทำให้ cache ในหน่วยความจำของหลาย worker (uvicorn --workers) ตรงกันโดยไม่ต้องมี broker
+
+ทุกการเขียน taxes/travels (และการเพิกถอน token) เพิ่มเลขในตาราง cache_versions ใน transaction เดียวกับข้อมูล
+(bump) แต่ละ worker อ่านตารางนี้ (ไม่กี่แถว) ทุก CACHE_SYNC_INTERVAL_SECONDS ถ้าเลขไม่ตรง
+กับที่เคยเห็นจะล้าง cache ของชุดข้อมูลนั้น worker อื่นจึงเห็นการเปลี่ยนแปลงภายในหนึ่งรอบ
+การ poll และ request ที่อ่าน cache ไม่ต้องตรวจอะไรเพิ่ม
+
+การเขียนของ worker เองอัปเดต cache ไปแล้ว (catalog.put) หลัง commit จึงขยับเลขที่เห็น
+ตามไปด้วย ถ้าไม่มีการเขียนจาก worker อื่นแทรกระหว่างนั้น
+"""
+import asyncio
+import logging
+import threading
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.catalog import tax_catalog, travel_catalog
+from app.database import dialect_insert, get_stream_session
+from app.models import CacheVersion
+
+logger = logging.getLogger(__name__)
+
+_PENDING = "cache_versions"  # key ใน Session.info: ชื่อ -> [เลขก่อน transaction, เลขล่าสุด]
+
+
+class CacheVersions:
+    def __init__(self):
+        self._seen = {}
+        self._handlers = {}
+        self._lock = threading.Lock()
+
+    def watch(self, name: str, handler) -> None:
+        """handler(db) ถูกเรียกเมื่อ worker อื่นเขียนชุดข้อมูล name (db ใช้อ่านส่วนที่เปลี่ยนได้)"""
+        self._handlers.setdefault(name, []).append(handler)
+
+    def bump(self, db: Session, name: str) -> tuple:
+        """เพิ่มเลขของ name ใน transaction ปัจจุบัน เรียกก่อน db.commit() คืน (เลขก่อน, เลขหลัง)"""
+        stmt = dialect_insert(db)(CacheVersion).values(name=name, version=1)
+        stmt = stmt.on_conflict_do_update(index_elements=["name"], set_={"version": CacheVersion.version + 1})
+        version = db.execute(stmt.returning(CacheVersion.version)).scalar_one()
+        pending = db.info.setdefault(_PENDING, {})
+        pending.setdefault(name, [version - 1, version])[1] = version
+        return version - 1, version
+
+    def _committed(self, session) -> None:
+        pending = session.info.pop(_PENDING, None)
+        if not pending:
+            return
+        with self._lock:
+            for name, (before, after) in pending.items():
+                # ถ้ามี worker อื่นเขียนแทรก ปล่อยให้ check() เห็นความต่างแล้วล้าง cache
+                if self._seen.get(name) == before:
+                    self._seen[name] = after
+
+    def _rolled_back(self, session) -> None:
+        session.info.pop(_PENDING, None)
+
+    def check(self, db: Session) -> list:
+        """เทียบเลขในฐานข้อมูลกับที่เคยเห็น ล้าง cache ที่เปลี่ยน และคืนชื่อชุดข้อมูลนั้น
+
+        ชุดข้อมูลที่ไม่เคยเห็นมาก่อนถือว่าเปลี่ยน (ปลอดภัยไว้ก่อน)
+        """
+        versions = dict(db.execute(select(CacheVersion.name, CacheVersion.version)).all())
+        db.commit()
+        changed = []
+        with self._lock:
+            for name in self._handlers:
+                version = versions.get(name, 0)
+                if self._seen.get(name) != version:
+                    self._seen[name] = version
+                    changed.append(name)
+        for name in changed:
+            for handler in self._handlers[name]:
+                handler(db)
+        if changed:
+            logger.debug("caches invalidated: %s", ", ".join(changed))
+        return changed
+
+
+cache_versions = CacheVersions()
+cache_versions.watch("taxes", lambda db: tax_catalog.invalidate())
+cache_versions.watch("travels", lambda db: travel_catalog.invalidate())
+
+# ทำงานกับทุก Session รวมถึง session แบบ sync ภายใน AsyncSession
+event.listen(Session, "after_commit", cache_versions._committed)
+event.listen(Session, "after_soft_rollback", lambda session, previous_transaction: cache_versions._rolled_back(session))
+
+
+def bump(db: Session, name: str) -> tuple:
+    return cache_versions.bump(db, name)
+
+
+async def check(db) -> list:
+    """check() ผ่าน session จาก get_session/get_stream_session"""
+    return await db.run_sync(cache_versions.check)
+
+
+async def sync_forever(interval: float) -> None:
+    """งานเบื้องหลังที่ตรวจการเขียนจาก worker อื่นทุก interval วินาที (ยกเลิกด้วย task.cancel())"""
+    while True:
+        await asyncio.sleep(interval)
+        db = get_stream_session()
+        try:
+            await check(db)
+        except Exception:
+            logger.exception("cache version check failed")
+        finally:
+            await db.close()
@@ -0,0 +1,76 @@
+"""คำนวณสิทธิ์ลดหย่อนภาษีของทริปจำนวนมากในครั้งเดียว
+
+ข้อมูลทริปถูกแยกเป็นคอลัมน์ (province, spend, ...) แล้วคำนวณทีละคอลัมน์
+กับตารางอัตราจาก tax_catalog โดยไม่ query ฐานข้อมูลและไม่วนสร้าง object ต่อทริป
+
+กติกา:
+- ลดหย่อน = spend * reduce_tax_percent / 100 ของจังหวัดนั้น
+- เพดานรวมแยกตามกลุ่มจังหวัดหลัก (is_secondary=0) และจังหวัดรอง (is_secondary=1)
+  ทริปที่มาก่อนในคำขอได้ใช้เพดานก่อน
+- ทริปที่อยู่นอกช่วงวันที่ของมาตรการ หรือ end_date < start_date ไม่ได้สิทธิ์
+"""
+from datetime import date
+from itertools import accumulate
+
+from app.config import TAX_DEDUCTION_CAP_MAIN, TAX_DEDUCTION_CAP_SECONDARY, TAX_CAMPAIGN_START, TAX_CAMPAIGN_END
+
+CAMPAIGN_START = date.fromisoformat(TAX_CAMPAIGN_START) if TAX_CAMPAIGN_START else None
+CAMPAIGN_END = date.fromisoformat(TAX_CAMPAIGN_END) if TAX_CAMPAIGN_END else None
+
+
+def _ineligible_reason(row, start, end):
+    if row is None:
+        return "Province not found"
+    if start and end and end < start:
+        return "end_date is before start_date"
+    if CAMPAIGN_START and ((start and start < CAMPAIGN_START) or (end and end < CAMPAIGN_START)):
+        return "Trip is outside the campaign period"
+    if CAMPAIGN_END and ((start and start > CAMPAIGN_END) or (end and end > CAMPAIGN_END)):
+        return "Trip is outside the campaign period"
+    return None
+
+
+def _apply_cap(amounts, in_group, cap):
+    """ตัดยอดตามเพดานรวมของกลุ่ม โดยใช้ยอดสะสม (prefix sum) ของกลุ่มนั้น"""
+    group_amounts = [amount if member else 0.0 for amount, member in zip(amounts, in_group)]
+    cumulative = accumulate(group_amounts)
+    return [
+        min(amount, max(0.0, cap - (total - amount))) if member else amount
+        for amount, member, total in zip(amounts, in_group, cumulative)
+    ]
+
+
+def calculate_deductions(trips, snapshot, cap_main=TAX_DEDUCTION_CAP_MAIN, cap_secondary=TAX_DEDUCTION_CAP_SECONDARY) -> dict:
+    provinces = [trip.province for trip in trips]
+    spends = [trip.spend for trip in trips]
+    rows = [snapshot.by_province.get(province) for province in provinces]
+
+    rates = [row["reduce_tax_percent"] if row else None for row in rows]
+    secondary = [row["is_secondary"] if row else None for row in rows]
+    reasons = [_ineligible_reason(row, trip.start_date, trip.end_date) for row, trip in zip(rows, trips)]
+    eligible = [reason is None for reason in reasons]
+
+    amounts = [spend * rate / 100 if ok else 0.0 for spend, rate, ok in zip(spends, rates, eligible)]
+    amounts = _apply_cap(amounts, [flag == 0 for flag in secondary], cap_main)
+    amounts = _apply_cap(amounts, [flag == 1 for flag in secondary], cap_secondary)
+    amounts = [round(amount, 2) for amount in amounts]
+
+    total_main = round(sum(amount for amount, flag in zip(amounts, secondary) if flag == 0), 2)
+    total_secondary = round(sum(amount for amount, flag in zip(amounts, secondary) if flag == 1), 2)
+    return {
+        "trips": [
+            {
+                "province": province,
+                "spend": spend,
+                "reduce_tax_percent": rate,
+                "is_secondary": flag,
+                "deduction": amount,
+                "eligible": ok,
+                "reason": reason,
+            }
+            for province, spend, rate, flag, amount, ok, reason in zip(provinces, spends, rates, secondary, amounts, eligible, reasons)
+        ],
+        "total_main": total_main,
+        "total_secondary": total_secondary,
+        "total": round(total_main + total_secondary, 2),
+    }
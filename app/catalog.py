@@ -0,0 +1,290 @@
+"""แคตตาล็อกจังหวัดในหน่วยความจำ สำหรับ endpoint อ่านอย่างเดียวของ /tax และ /travel
+
+ตาราง taxes/travels เปลี่ยนแค่ไม่กี่ครั้งต่อปี จึงโหลดครั้งเดียวแล้วให้ทุก request
+อ่านจาก snapshot ที่ไม่เปลี่ยนแปลง แทนการ query SQLite ทุกครั้ง
+การเขียน (create_tax/create_travel) จะสร้าง snapshot ใหม่แล้วสลับทีเดียว
+
+snapshot ยังเก็บ JSON ของแต่ละแถว (ตาม response schema) ที่เข้ารหัสแล้ว
+endpoint อ่านจึงแค่ต่อ bytes ไม่ต้อง validate/encode ทุก request
+"""
+import hashlib
+import heapq
+import json
+import threading
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+from sqlalchemy import inspect, select
+from starlette.concurrency import run_in_threadpool
+
+from app.fast_json import encode_compat, json_array
+from app.models import CacheVersion, Tax, Travel
+from app.schemas import TaxResponse, TravelResponse
+
+# ช่วงของตัวกรองที่มีแถวไม่เกิน 1/RANGE_SCAN_RATIO ของทั้งหมด เลือกจาก index แทนการไล่ตาม id
+RANGE_SCAN_RATIO = 8
+
+
+class CatalogSnapshot:
+    """ข้อมูลทั้งตาราง ณ version หนึ่ง พร้อม index ตาม province และ is_secondary"""
+
+    __slots__ = (
+        "version", "tag", "rows", "ids", "by_province", "secondary", "secondary_ids",
+        "_partitions", "_value_index", "_digest", "_encode_row", "_json",
+    )
+
+    def __init__(self, version: int, rows, encode_row=None, json_cache=None, tag=None):
+        self.version = version
+        # เลขของชุดข้อมูลนี้ในตาราง cache_versions (None = ไม่รู้)
+        self.tag = tag
+        self.rows = tuple(sorted(rows, key=lambda row: row["id"]))
+        self.ids = [row["id"] for row in self.rows]
+        self.by_province = {row["province"]: row for row in self.rows}
+        self.secondary = tuple(row for row in self.rows if row["is_secondary"] == 1)
+        self.secondary_ids = [row["id"] for row in self.secondary]
+        self._partitions = None
+        self._value_index = {}
+        self._digest = None
+        self._encode_row = encode_row
+        # id -> bytes ของแถว เข้ารหัสเมื่อถูกขอครั้งแรก (รับของ snapshot ก่อนหน้ามาได้)
+        self._json = json_cache if json_cache is not None else {}
+
+    def row_json(self, row) -> bytes:
+        data = self._json.get(row["id"])
+        if data is None:
+            data = self._json[row["id"]] = self._encode_row(row)
+        return data
+
+    def rows_json(self, rows) -> bytes:
+        return json_array([self.row_json(row) for row in rows])
+
+    def batch_json(self, provinces) -> bytes:
+        """{"results": {จังหวัด: แถว หรือ null}, "not_found": [...]} ตามลำดับที่ขอ (ชื่อซ้ำนับครั้งเดียว)"""
+        items, missing = [], []
+        for province in dict.fromkeys(provinces):
+            row = self.by_province.get(province)
+            if row is None:
+                missing.append(province)
+            items.append(encode_compat(province) + b":" + (self.row_json(row) if row is not None else b"null"))
+        return b'{"results":{' + b",".join(items) + b'},"not_found":' + encode_compat(missing) + b"}"
+
+    @property
+    def digest(self) -> str:
+        """ค่าที่ใช้ทำ ETag ทุก worker ได้ค่าเดียวกันสำหรับข้อมูลชุดเดียวกัน
+
+        ปกติคือเลขใน cache_versions ที่ snapshot นี้ตรงกับ (tag) ถ้าไม่รู้ (มีการเขียนจาก worker อื่น
+        แทรกระหว่าง put) ใช้ hash ของเนื้อหาทั้ง snapshot ซึ่งคำนวณครั้งเดียวใน threadpool (ดู digest_async)
+        """
+        if self._digest is None:
+            if self.tag is not None:
+                self._digest = f"v{self.tag}"
+            else:
+                payload = json.dumps(self.rows, sort_keys=True, ensure_ascii=False, default=str)
+                self._digest = hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+        return self._digest
+
+    async def digest_async(self) -> str:
+        if self._digest is None and self.tag is None:
+            return await run_in_threadpool(lambda: self.digest)
+        return self.digest
+
+    def _partition(self, is_secondary):
+        """(rows, ids) ของแถวที่ is_secondary ตรงกัน แบ่งครั้งเดียวต่อ snapshot เมื่อถูกขอครั้งแรก"""
+        if is_secondary == 1:
+            return self.secondary, self.secondary_ids
+        if self._partitions is None:
+            partitions = {}
+            for row in self.rows:
+                partitions.setdefault(row["is_secondary"], []).append(row)
+            self._partitions = {value: (tuple(rows), [row["id"] for row in rows]) for value, rows in partitions.items()}
+        return self._partitions.get(is_secondary, ((), []))
+
+    def _sorted_by(self, column):
+        """(ค่า, แถว) ที่เรียงตามค่าของ column (ไม่รวม None) สร้างครั้งเดียวต่อ snapshot"""
+        index = self._value_index.get(column)
+        if index is None:
+            # self.rows เรียงตาม id อยู่แล้ว sort แบบ stable จึงได้ลำดับ (ค่า, id)
+            rows = sorted((row for row in self.rows if row[column] is not None), key=itemgetter(column))
+            index = self._value_index[column] = ([row[column] for row in rows], rows)
+        return index
+
+    def _range(self, column, low, high):
+        """(แถวที่เรียงตามค่า, ตำแหน่งเริ่ม, ตำแหน่งจบ) ของแถวที่ค่าอยู่ในช่วง"""
+        values, rows = self._sorted_by(column)
+        start = bisect_left(values, low) if low is not None else 0
+        end = bisect_right(values, high) if high is not None else len(values)
+        return rows, start, max(start, end)
+
+    def page(self, after_id=None, limit=100, is_secondary=None, ranges=None):
+        """keyset pagination บน id
+
+        ranges คือ dict ของ {คอลัมน์: (ต่ำสุด, สูงสุด)} (None = ไม่จำกัด)
+        คืน (rows, next_cursor) โดย next_cursor เป็น None เมื่อไม่มีหน้าถัดไป
+
+        is_secondary ใช้ partition ของค่านั้น ส่วน ranges ใช้ index ที่เรียงตามค่า: ถ้าช่วงที่เลือก
+        มีแถวน้อย (ไม่เกิน 1/RANGE_SCAN_RATIO ของ partition) เลือก limit แถวแรกตาม id จากช่วงนั้น
+        ไม่เช่นนั้นแถวที่ตรงมีมากพอที่การไล่ตาม id จะเต็มหน้าได้เร็ว index ถูกสร้างครั้งแรกที่ถูกใช้
+        (ดู page_async)
+        """
+        rows, ids = self._partition(is_secondary) if is_secondary is not None else (self.rows, self.ids)
+        start = bisect_right(ids, after_id) if after_id is not None else 0
+        ranges = {col: bounds for col, bounds in (ranges or {}).items() if bounds != (None, None)}
+        if not ranges:
+            result = rows[start:start + limit]
+            has_more = start + limit < len(rows)
+            return list(result), (result[-1]["id"] if has_more and result else None)
+
+        # ช่วงที่มีแถวน้อยที่สุดเป็น candidate
+        sorted_rows, low, high = min(
+            (self._range(col, low, high) for col, (low, high) in ranges.items()),
+            key=lambda found: found[2] - found[1],
+        )
+        if (high - low) * RANGE_SCAN_RATIO <= len(rows):
+            matches = heapq.nsmallest(
+                limit + 1,
+                (
+                    row for row in sorted_rows[low:high]
+                    if (after_id is None or row["id"] > after_id)
+                    and (is_secondary is None or row["is_secondary"] == is_secondary)
+                    and _in_ranges(row, ranges)
+                ),
+                key=lambda row: row["id"],
+            )
+            result = matches[:limit]
+            return result, (result[-1]["id"] if len(matches) > limit else None)
+
+        result = []
+        for index in range(start, len(rows)):
+            row = rows[index]
+            if not _in_ranges(row, ranges):
+                continue
+            result.append(row)
+            if len(result) == limit:
+                has_more = index + 1 < len(rows)
+                return result, (row["id"] if has_more else None)
+        return result, None
+
+
+    async def page_async(self, after_id=None, limit=100, is_secondary=None, ranges=None):
+        """page() ที่มีตัวกรองทำใน threadpool (ครั้งแรกต้องสร้าง index ซึ่งใช้เวลาตามขนาดตาราง)"""
+        filtered = is_secondary not in (None, 1) or any(bounds != (None, None) for bounds in (ranges or {}).values())
+        if not filtered:
+            return self.page(after_id, limit, is_secondary, ranges)
+        return await run_in_threadpool(self.page, after_id, limit, is_secondary, ranges)
+
+
+def _in_ranges(row, ranges) -> bool:
+    for column, (low, high) in ranges.items():
+        value = row[column]
+        if value is None:
+            return False
+        if low is not None and value < low:
+            return False
+        if high is not None and value > high:
+            return False
+    return True
+
+
+class ProvinceCatalog:
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+        self.columns = tuple(attr.key for attr in inspect(model).column_attrs)
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshot = None
+        self._listeners = []
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def parse_fields(self, fields):
+        """แปลง "a,b" เป็น tuple ของคอลัมน์ (None = ทุกคอลัมน์) และ ValueError ถ้ามีคอลัมน์ที่ไม่รู้จัก"""
+        if not fields:
+            return None
+        names = tuple(name.strip() for name in fields.split(",") if name.strip())
+        unknown = [name for name in names if name not in self.columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return names
+
+    def subscribe(self, listener) -> None:
+        """listener(row) ถูกเรียกหลัง put() และ listener(None) หลัง invalidate()"""
+        self._listeners.append(listener)
+
+    def _notify(self, row) -> None:
+        for listener in self._listeners:
+            listener(row)
+
+    def to_row(self, obj) -> dict:
+        return {key: getattr(obj, key) for key in self.columns}
+
+    def encode_row(self, row) -> bytes:
+        """bytes เดียวกับที่ FastAPI สร้างจาก response_model=schema"""
+        return encode_compat(self.schema.model_validate(row).model_dump(mode="json"))
+
+    def snapshot(self, db) -> CatalogSnapshot:
+        snap = self._snapshot
+        if snap is None:
+            snap = self._load(db)
+        return snap
+
+    async def snapshot_async(self, db) -> CatalogSnapshot:
+        """เหมือน snapshot() แต่รับ session จาก get_session (AsyncSession หรือ SyncSessionRunner)"""
+        snap = self._snapshot
+        if snap is None:
+            snap = await db.run_sync(self._load)
+        return snap
+
+    def _table_version(self, db) -> int:
+        stmt = select(CacheVersion.version).where(CacheVersion.name == self.model.__tablename__)
+        return db.execute(stmt).scalar() or 0
+
+    def _load(self, db) -> CatalogSnapshot:
+        # ไม่ถือ lock ระหว่าง query เพื่อไม่ให้ reader อื่นต้องรอ
+        version = self._version
+        table_version = self._table_version(db)
+        rows = [self.to_row(obj) for obj in db.query(self.model).all()]
+        # ทุกการเขียนเพิ่มเลขใน transaction เดียวกับข้อมูล ถ้าเลขไม่เปลี่ยนระหว่างอ่าน แถวที่ได้ตรงกับเลขนั้น
+        # (SQLite อ่านใน transaction เดียวเห็นข้อมูลชุดเดียวกันอยู่แล้ว ส่วน PostgreSQL อาจเห็น commit ระหว่าง query)
+        tag = table_version if self._table_version(db) == table_version else None
+        snap = CatalogSnapshot(version, rows, self.encode_row, tag=tag)
+        with self._lock:
+            # ติดตั้ง snapshot เฉพาะเมื่อไม่มีการเขียนเกิดขึ้นระหว่างโหลด
+            if self._version == version and self._snapshot is None:
+                self._snapshot = snap
+        return snap
+
+    def put(self, obj, versions=None) -> None:
+        """อัปเดต (หรือเพิ่ม) แถวเดียวหลัง commit สำเร็จ
+
+        versions คือ (ก่อน, หลัง) จาก cache_sync.bump ของ transaction นั้น snapshot ใหม่ได้ tag
+        "หลัง" เฉพาะเมื่อ snapshot เดิมตรงกับ "ก่อน" (ไม่มีการเขียนอื่นที่ snapshot นี้ยังไม่เห็น)
+        """
+        row = self.to_row(obj)
+        with self._lock:
+            self._version += 1
+            snap = self._snapshot
+            if snap is not None:
+                tag = versions[1] if versions is not None and snap.tag is not None and snap.tag == versions[0] else None
+                self._snapshot = self._replace_row(snap, row, tag)
+        self._notify(row)
+
+    def _replace_row(self, snap, row, tag=None) -> CatalogSnapshot:
+        rows = [r for r in snap.rows if r["id"] != row["id"] and r["province"] != row["province"]]
+        rows.append(row)
+        # ใช้ bytes ของแถวที่ไม่เปลี่ยนต่อได้
+        kept = {r["id"] for r in rows}
+        json_cache = {key: data for key, data in snap._json.items() if key in kept and key != row["id"]}
+        return CatalogSnapshot(self._version, rows, self.encode_row, json_cache, tag)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+        self._notify(None)
+
+
+tax_catalog = ProvinceCatalog(Tax, TaxResponse)
+travel_catalog = ProvinceCatalog(Travel, TravelResponse)
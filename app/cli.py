@@ -0,0 +1,79 @@
+"""คำสั่งดูแลระบบที่รันนอก web server
+
+    python -m app.cli import-tax provinces.csv --atomic
+    python -m app.cli import-travel travels.ndjson --format ndjson
+    python -m app.cli import-users partner.csv --workers 8
+    python -m app.cli reconcile-stats
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app.bulk import BulkImporter, iter_file_chunks
+from app.database import SessionLocal
+from app.models import Tax, Travel
+from app.provisioning import provision_file
+from app.stats import reconcile
+from app.schemas import TaxCreate, TravelCreate
+
+IMPORT_TARGETS = {
+    "import-tax": (Tax, TaxCreate),
+    "import-travel": (Travel, TravelCreate),
+}
+
+
+def import_file(model, schema, path: str, fmt: str, chunk_size: int, atomic: bool) -> dict:
+    importer = BulkImporter(model, schema, fmt, atomic)
+    with SessionLocal() as db, open(path, "rb") as file:
+        for lines in iter_file_chunks(file, chunk_size):
+            importer.feed(db, lines)
+        importer.finish(db)
+    return importer.report()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in IMPORT_TARGETS:
+        command = commands.add_parser(name, help=f"upsert rows from a CSV/NDJSON file ({name[7:]})")
+        command.add_argument("path")
+        command.add_argument("--format", choices=("csv", "ndjson"), help="default: from the file extension")
+        command.add_argument("--chunk-size", type=int, default=1000)
+        command.add_argument("--atomic", action="store_true", help="single transaction, all or nothing")
+    command = commands.add_parser("import-users", help="register users from a CSV/NDJSON file (username,password,fullname,phone)")
+    command.add_argument("path")
+    command.add_argument("--format", choices=("csv", "ndjson"), help="default: from the file extension")
+    command.add_argument("--chunk-size", type=int, default=500)
+    command.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="bcrypt threads")
+    commands.add_parser("reconcile-stats", help="rebuild the /stats counters from the tables")
+    args = parser.parse_args(argv)
+
+    if args.command in IMPORT_TARGETS:
+        model, schema = IMPORT_TARGETS[args.command]
+        fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+        report = import_file(model, schema, args.path, fmt, args.chunk_size, args.atomic)
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 1 if report["errors"] else 0
+    if args.command == "import-users":
+        fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+        def on_progress(progress):
+            print("processed {processed}, created {created}, failed {failed}".format(**progress), file=sys.stderr, flush=True)
+
+        with SessionLocal() as db, ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="bcrypt") as executor:
+            report = provision_file(db, args.path, fmt, args.chunk_size, executor, on_progress)
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 1 if report["errors"] else 0
+    if args.command == "reconcile-stats":
+        with SessionLocal() as db:
+            json.dump({"reconciled": reconcile(db)}, sys.stdout)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
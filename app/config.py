@@ -6,4 +6,74 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# refresh token ใช้ได้ครั้งเดียว แลกเป็นคู่ใหม่ที่ POST /token/refresh โดยไม่ต้อง login (bcrypt) ซ้ำ
+REFRESH_TOKEN_EXPIRE_DAYS = float(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 14))
 DATABASE_URL = os.getenv("DATABASE_URL")
+# "async" = AsyncSession (aiosqlite/asyncpg), "sync" = Session เดิมบน threadpool (ไว้ benchmark เทียบกัน)
+DB_MODE = os.getenv("DB_MODE", "async")
+
+# bcrypt: cost (log2 rounds), จำนวน worker และจำนวนงานที่รอได้สูงสุดก่อนตอบ 503
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 64))
+# จำนวน thread ของ bcrypt สำหรับ POST /register/bulk (แยกจาก pool ของ login/register ปกติ)
+BULK_HASH_WORKERS = int(os.getenv("BULK_HASH_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
+# จำนวนรหัสผ่านที่ทุก POST /register/bulk รวมกันจองไว้ hash ได้พร้อมกัน (แต่ละ request จองเท่า chunk_size) ก่อนตอบ 503
+BULK_HASH_QUEUE_LIMIT = int(os.getenv("BULK_HASH_QUEUE_LIMIT", 5000))
+# username ที่เป็นผู้ดูแล คั่นด้วย , (ใช้ POST /register/bulk ได้ ว่าง = ไม่มีใครใช้ได้)
+ADMIN_USERNAMES = frozenset(name.strip() for name in os.getenv("ADMIN_USERNAMES", "").split(",") if name.strip())
+
+# cache ของ token ที่ตรวจแล้วใน get_current_user
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", 300))
+
+# Cache-Control ของ endpoint อ่านข้อมูล tax/travel (วินาที)
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", 60))
+
+# เพดานลดหย่อนรวมต่อคำขอ แยกจังหวัดหลัก/จังหวัดรอง (บาท) และช่วงวันที่ของมาตรการ (YYYY-MM-DD, ว่าง = ไม่จำกัด)
+TAX_DEDUCTION_CAP_MAIN = float(os.getenv("TAX_DEDUCTION_CAP_MAIN", 15000))
+TAX_DEDUCTION_CAP_SECONDARY = float(os.getenv("TAX_DEDUCTION_CAP_SECONDARY", 20000))
+TAX_CAMPAIGN_START = os.getenv("TAX_CAMPAIGN_START") or None
+TAX_CAMPAIGN_END = os.getenv("TAX_CAMPAIGN_END") or None
+
+# โปรไฟล์ของ engine: "tuned" = WAL + pragmas + เขียนทีละรายการ, "default" = ค่าเดิมของ SQLite (ไว้เทียบ benchmark)
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+# สร้างตารางที่ยังไม่มีตอนสร้าง engine ครั้งแรก
+DB_AUTO_CREATE_SCHEMA = int(os.getenv("DB_AUTO_CREATE_SCHEMA", 1))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", 65536))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+# metrics แบบ Prometheus ที่ /metrics (0 = ปิด middleware และ event ของ engine)
+METRICS_ENABLED = int(os.getenv("METRICS_ENABLED", 1))
+
+# profile ทีละ request: token ของ header X-Profile (ว่าง = ปิด) และอัตราสุ่ม profile (0.0 - 1.0)
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN") or None
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", 20))
+
+# จำกัดการ login (ดู app.rate_limit): token bucket ต่อ IP/username และ lockout แบบก้าวหน้า
+LOGIN_RATE_LIMIT_ENABLED = int(os.getenv("LOGIN_RATE_LIMIT_ENABLED", 1))
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", 20))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", 30))
+LOGIN_USER_BURST = int(os.getenv("LOGIN_USER_BURST", 5))
+LOGIN_USER_PER_MINUTE = float(os.getenv("LOGIN_USER_PER_MINUTE", 5))
+LOGIN_LOCKOUT_THRESHOLD = int(os.getenv("LOGIN_LOCKOUT_THRESHOLD", 5))
+LOGIN_LOCKOUT_BASE_SECONDS = int(os.getenv("LOGIN_LOCKOUT_BASE_SECONDS", 30))
+LOGIN_LOCKOUT_MAX_SECONDS = int(os.getenv("LOGIN_LOCKOUT_MAX_SECONDS", 900))
+LOGIN_FAILURE_WINDOW_SECONDS = int(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", 3600))
+# "memory" = ใน process, "sqlite" = ไฟล์ที่ทุก worker ใช้ร่วมกัน
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "./ratelimit.db")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+# สร้าง engine, schema, โหลด catalog และไลบรารี auth ตอน startup แทน request แรก
+PREWARM_ON_STARTUP = int(os.getenv("PREWARM_ON_STARTUP", 1))
+
+# worker ตรวจการเขียนจาก worker อื่น (ตาราง cache_versions) ทุกกี่วินาที แล้วล้าง cache ที่เก่า (0 = ปิด)
+CACHE_SYNC_INTERVAL_SECONDS = float(os.getenv("CACHE_SYNC_INTERVAL_SECONDS", 1))
+
+# reconcile ตัวนับของ /stats กับตารางทุกกี่วินาที (0 = ปิด ใช้ python -m app.cli reconcile-stats แทน)
+STATS_RECONCILE_INTERVAL_SECONDS = float(os.getenv("STATS_RECONCILE_INTERVAL_SECONDS", 0))
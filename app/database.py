@@ -1,18 +1,231 @@
-from sqlalchemy import create_engine
+import asyncio
+import contextlib
+import threading
+import weakref
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from fastapi import Depends
+from starlette.concurrency import run_in_threadpool
+
+from app import metrics, profiling
+from app.config import (
+    DATABASE_URL, DB_MODE, DB_PROFILE, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_AUTO_CREATE_SCHEMA, METRICS_ENABLED,
+    SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KIB, SQLITE_MMAP_SIZE,
+)
 
 
 #SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
+SQLALCHEMY_DATABASE_URL = DATABASE_URL or "sqlite:///./app.db"
+
+# driver แบบ async ที่ใช้แทน driver sync ของแต่ละฐานข้อมูล
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername)).render_as_string(hide_password=False)
+
+IS_SQLITE = make_url(SQLALCHEMY_DATABASE_URL).get_backend_name() == "sqlite"
+
+# pragma ที่ตั้งทุกครั้งที่เปิด connection ใหม่ ตาม config.DB_PROFILE
+SQLITE_PROFILES = {
+    "default": {},
+    "tuned": {
+        "journal_mode": "WAL",              # reader ไม่ block writer และกลับกัน
+        "synchronous": "NORMAL",            # ปลอดภัยเมื่อใช้ WAL และ fsync น้อยลงมาก
+        "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": -SQLITE_CACHE_SIZE_KIB,  # ค่าติดลบ = หน่วย KiB
+        "mmap_size": SQLITE_MMAP_SIZE,
+        "temp_store": "MEMORY",
+    },
+}
+
+def _engine_kwargs(url: str) -> dict:
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+    kwargs = {"connect_args": {"check_same_thread": False}}
+    # in-memory ใช้ pool พิเศษของ SQLAlchemy ซึ่งไม่รับ pool_size
+    if url.database not in (None, "", ":memory:"):
+        kwargs.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+    return kwargs
+
+def apply_sqlite_profile(sync_engine, profile: str = DB_PROFILE) -> None:
+    pragmas = SQLITE_PROFILES[profile]
+    if not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
+# engine และ session factory ถูกสร้างครั้งแรกที่ถูกใช้ (หรือตอน prewarm) ไม่ใช่ตอน import
+# ชื่อเดิม engine, SessionLocal, async_engine, AsyncSessionLocal ยัง import ได้ผ่าน __getattr__ ด้านล่าง
+_lazy = {}
+_lazy_lock = threading.RLock()  # factory ของ sessionmaker เรียก get_engine() ซ้อน
+
+def _instrument(sync_engine) -> None:
+    if IS_SQLITE:
+        apply_sqlite_profile(sync_engine)
+    # event นับ/บันทึก SQL ต่อ request ของ /metrics และ profiler
+    if METRICS_ENABLED:
+        metrics.instrument_engine(sync_engine)
+    profiling.instrument_engine(sync_engine)
+
+def _once(name, factory):
+    value = _lazy.get(name)
+    if value is None:
+        with _lazy_lock:
+            value = _lazy.get(name)
+            if value is None:
+                value = _lazy[name] = factory()
+    return value
+
+def _create_engine():
+    sync_engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL))
+    _instrument(sync_engine)
+    if DB_AUTO_CREATE_SCHEMA:
+        create_schema(sync_engine)
+    return sync_engine
+
+def _create_async_engine():
+    get_engine()  # สร้าง schema ผ่าน engine แบบ sync ก่อน
+    async_engine = create_async_engine(to_async_url(SQLALCHEMY_DATABASE_URL), **_engine_kwargs(SQLALCHEMY_DATABASE_URL))
+    _instrument(async_engine.sync_engine)
+    return async_engine
+
+def create_schema(sync_engine) -> None:
+    """สร้างตารางที่ยังไม่มี (แทนการรัน test_db.py แยก)"""
+    import app.models  # noqa: F401  ลงทะเบียน model ทั้งหมดกับ Base.metadata
+
+    Base.metadata.create_all(sync_engine)
+
+def get_engine():
+    return _once("engine", _create_engine)
+
+def get_sessionmaker():
+    # expire_on_commit=False เหมือน AsyncSessionLocal: object ที่อ่านไว้ยังใช้ได้หลัง commit
+    # โดยไม่ต้องโหลดซ้ำ (ดู release_connection)
+    return _once("SessionLocal", lambda: sessionmaker(
+        bind=get_engine(), autoflush=False, autocommit=False, expire_on_commit=False,
+    ))
+
+def get_async_engine():
+    return _once("async_engine", _create_async_engine)
+
+def get_async_sessionmaker():
+    return _once("AsyncSessionLocal", lambda: async_sessionmaker(
+        bind=get_async_engine(), autoflush=False, expire_on_commit=False,
+    ))
+
+_LAZY_NAMES = {
+    "engine": get_engine,
+    "SessionLocal": get_sessionmaker,
+    "async_engine": get_async_engine,
+    "AsyncSessionLocal": get_async_sessionmaker,
+}
+
+def __getattr__(name):
+    if name in _LAZY_NAMES:
+        return _LAZY_NAMES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def get_db():
-    db = SessionLocal()
+    db = get_sessionmaker()()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+class SyncSessionRunner:
+    """ห่อ Session แบบ sync ให้มี run_sync เหมือน AsyncSession
+
+    router เขียนงาน ORM เป็นฟังก์ชัน sync แล้วเรียก await db.run_sync(fn, ...)
+    ได้เหมือนกันทั้งสองโหมด: โหมด async รันบน AsyncSession ส่วนโหมด sync รันบน threadpool
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.session, *args, **kwargs)
+
+    async def close(self):
+        await run_in_threadpool(self.session.close)
+
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+async def get_sync_db(db: Session = Depends(get_db)):
+    yield SyncSessionRunner(db)
+
+# dependency ที่ router ใช้ เลือกตาม config.DB_MODE
+get_session = get_async_db if DB_MODE == "async" else get_sync_db
+
+def get_stream_session():
+    """session สำหรับ StreamingResponse ซึ่งผู้ใช้ต้อง await db.close() เอง
+
+    dependency แบบ yield (get_session) ถูกปิดก่อนที่ FastAPI จะเริ่มส่ง body
+    """
+    if DB_MODE == "async":
+        return get_async_sessionmaker()()
+    return SyncSessionRunner(get_sessionmaker()())
+
+
+
+# SQLite มี writer ได้ทีละหนึ่งเดียว ให้การเขียนภายใน worker เดียวกันต่อคิวกันเองแทนที่จะชนกัน
+# จนได้ "database is locked" (ข้าม worker ใช้ busy_timeout) ฐานข้อมูลอื่นไม่ต้องต่อคิว
+SERIALIZE_WRITES = IS_SQLITE and DB_PROFILE == "tuned"
+_write_locks = weakref.WeakKeyDictionary()
+
+def write_lock():
+    """lock สำหรับงานเขียน (หนึ่งอันต่อ event loop) ใช้กับ async with"""
+    if not SERIALIZE_WRITES:
+        return contextlib.nullcontext()
+    loop = asyncio.get_running_loop()
+    lock = _write_locks.get(loop)
+    if lock is None:
+        lock = _write_locks[loop] = asyncio.Lock()
+    return lock
+
+def release_connection(db: Session) -> None:
+    """จบ transaction ของการอ่านเพื่อคืน connection ให้ pool
+
+    ต้องเรียกก่อนรองานที่ช้า (bcrypt) หรือรอ write_lock ไม่เช่นนั้น request ที่รอ lock
+    จะถือ connection จนหมด pool ขณะที่ผู้ถือ lock ต้องการ connection ใหม่
+    """
+    db.commit()
+
+def dialect_insert(db: Session):
+    """insert() ของ dialect ของ session ที่มี on_conflict_do_update (SQLite/PostgreSQL)"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+async def run_write(db, fn, *args, **kwargs):
+    """เหมือน db.run_sync แต่ต่อคิวกับงานเขียนอื่นใน worker เดียวกัน"""
+    async with write_lock():
+        return await db.run_sync(fn, *args, **kwargs)
+
+async def dispose_engines() -> None:
+    """ปิด connection ใน pool ทั้งหมด (thread ของ aiosqlite ไม่ใช่ daemon ถ้าไม่ปิด process จะไม่จบ)"""
+    if "async_engine" in _lazy:
+        await _lazy["async_engine"].dispose()
+    if "engine" in _lazy:
+        _lazy["engine"].dispose()
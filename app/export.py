@@ -0,0 +1,89 @@
+"""ส่งออกตาราง taxes/travels ทั้งตารางแบบ stream (CSV หรือ NDJSON)
+
+อ่านผ่าน cursor ด้วย yield_per ทีละ chunk_size แถว แล้วเข้ารหัสและส่งทีละชุด
+หน่วยความจำจึงคงที่ไม่ว่าตารางจะใหญ่แค่ไหน ถ้า client ส่ง Accept-Encoding: gzip
+จะบีบอัดแบบ stream และ flush ทุกชุด
+"""
+import csv
+import io
+import zlib
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.fast_json import dumps
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+async def iter_partitions(db, stmt, chunk_size: int):
+    """อ่านผลของ stmt ทีละ chunk_size แถว แล้วปิด session เมื่อจบ (หรือ client ตัดการเชื่อมต่อ)"""
+    stmt = stmt.execution_options(yield_per=chunk_size)
+    try:
+        if isinstance(db, AsyncSession):
+            result = await db.stream(stmt)
+            async for rows in result.partitions():
+                yield rows
+        else:
+            result = await db.run_sync(lambda session: session.execute(stmt))
+            partitions = result.partitions()
+            while (rows := await run_in_threadpool(next, partitions, None)) is not None:
+                yield rows
+    finally:
+        await db.close()
+
+
+def encode_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def encode_ndjson(columns, rows) -> bytes:
+    return b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+async def encode_rows(partitions, columns, fmt: str):
+    if fmt == "csv":
+        # header ส่งได้ทันทีก่อน query เสร็จ
+        yield encode_csv([columns])
+    async for rows in partitions:
+        yield encode_csv(rows) if fmt == "csv" else encode_ndjson(columns, rows)
+
+
+async def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 = รูปแบบ gzip
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(request: Request) -> bool:
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def export_response(request: Request, db, model, fmt: str, chunk_size: int) -> StreamingResponse:
+    table = model.__table__
+    columns = [column.name for column in table.columns]
+    stmt = select(*table.columns).order_by(table.primary_key.columns.values()[0])
+    body = encode_rows(iter_partitions(db, stmt, chunk_size), columns, fmt)
+    headers = {
+        "Content-Disposition": f'attachment; filename="{table.name}.{fmt}"',
+        "Vary": "Accept-Encoding",
+    }
+    if accepts_gzip(request):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[fmt], headers=headers)
@@ -0,0 +1,46 @@
+"""เข้ารหัส JSON แบบเร็วสำหรับ response
+
+- encode_compat: ได้ bytes เหมือน fastapi.responses.JSONResponse ทุกไบต์ (json มาตรฐาน)
+  ใช้สร้าง bytes ของแต่ละแถวที่ cache ไว้ใน catalog snapshot จึงจ่ายค่าเข้ารหัสครั้งเดียวต่อ version
+- dumps / FastJSONResponse: ใช้ orjson ถ้าติดตั้งไว้ (ไม่ติดตั้งก็ถอยไปใช้ json มาตรฐาน)
+  สำหรับ payload ที่สร้างใหม่ทุก request เช่น fields=... หรือ /tax/calculate
+  ผลเหมือน json มาตรฐาน ยกเว้น float ที่เขียนแบบ exponent (1e16 แทน 1e+16)
+  ซึ่งไม่เกิดกับเปอร์เซ็นต์หรือจำนวนเงินในระบบนี้
+"""
+import json
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson เป็น optional
+    orjson = None
+
+
+def encode_compat(content) -> bytes:
+    # ต้องตรงกับ starlette JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+if orjson is not None:
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+else:
+    dumps = encode_compat
+
+
+class FastJSONResponse(JSONResponse):
+    """default response class ของ app"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_array(items) -> bytes:
+    """ต่อ bytes ของแต่ละ element ที่เข้ารหัสไว้แล้วเป็น JSON array"""
+    return b"[" + b",".join(items) + b"]"
+
+
+def raw_json_response(body: bytes, headers: dict | None = None, status_code: int = 200) -> Response:
+    return Response(body, status_code=status_code, media_type=JSONResponse.media_type, headers=headers)
@@ -0,0 +1,31 @@
+"""ETag / If-None-Match และ Cache-Control สำหรับ endpoint ที่อ่านจาก catalog"""
+import hashlib
+
+from fastapi import Request, Response
+
+from app.config import CATALOG_CACHE_MAX_AGE
+
+
+async def catalog_cache_headers(request: Request, snapshot) -> dict:
+    """ETag แบบ strong ผูกกับ snapshot และ URL (path + query) ของ request"""
+    key = f"{await snapshot.digest_async()}|{request.url.path}?{request.url.query}".encode()
+    etag = '"' + hashlib.blake2b(key, digest_size=12).hexdigest() + '"'
+    return {"ETag": etag, "Cache-Control": f"public, max-age={CATALOG_CACHE_MAX_AGE}"}
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match เทียบแบบ weak จึงตัด W/ ออกก่อน
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def not_modified_response(request: Request, headers: dict):
+    """คืน Response 304 ถ้า client มีข้อมูลล่าสุดอยู่แล้ว ไม่เช่นนั้นคืน None"""
+    if is_not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return None
@@ -1,14 +1,62 @@
-from fastapi import FastAPI
-from app.routers import register_router, login_router, travel_router, tax_router
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
-app = FastAPI()
+from fastapi import FastAPI, Response
+from app.config import METRICS_ENABLED, PREWARM_ON_STARTUP, CACHE_SYNC_INTERVAL_SECONDS, STATS_RECONCILE_INTERVAL_SECONDS
+from app.database import dispose_engines
+from app.fast_json import FastJSONResponse
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from app.profiling import ProfilingMiddleware
+from app.routers import register_router, login_router, travel_router, tax_router, search_router, province_router, profile_router, stats_router, token_router
+from app.cache_sync import sync_forever
+from app.startup import prewarm, record_import, uses_app_database
+from app.stats import reconcile_forever
 
-app.include_router(register_router)
-app.include_router(login_router)
-app.include_router(travel_router)
-app.include_router(tax_router)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PREWARM_ON_STARTUP:
+        await prewarm(app)
+    tasks = []
+    if uses_app_database(app):
+        if CACHE_SYNC_INTERVAL_SECONDS > 0:
+            tasks.append(asyncio.create_task(sync_forever(CACHE_SYNC_INTERVAL_SECONDS)))
+        if STATS_RECONCILE_INTERVAL_SECONDS > 0:
+            tasks.append(asyncio.create_task(reconcile_forever(STATS_RECONCILE_INTERVAL_SECONDS)))
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await dispose_engines()
 
-@app.get("/")
-def root():
-    return {"message": "Welcome to the Travel Tax API"}
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+    app.add_middleware(ProfilingMiddleware)
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    app.include_router(register_router)
+    app.include_router(login_router)
+    app.include_router(token_router)
+    app.include_router(travel_router)
+    app.include_router(tax_router)
+    app.include_router(search_router)
+    app.include_router(province_router)
+    app.include_router(profile_router)
+    app.include_router(stats_router)
+
+    @app.get("/")
+    def root():
+        return {"message": "Welcome to the Travel Tax API"}
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(registry.render(), media_type=CONTENT_TYPE)
+
+    return app
+
+
+app = create_app()
+record_import()
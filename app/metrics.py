@@ -0,0 +1,194 @@
+"""metrics แบบ Prometheus (text exposition format) ที่ไม่ต้องพึ่งไลบรารีภายนอก
+
+- MetricsMiddleware: จำนวน request, latency histogram และ in-flight gauge แยกตาม route
+- instrument_engine: นับจำนวนและเวลาของ SQL ต่อ request ผ่าน event ของ SQLAlchemy
+- observe_password_hash: เวลาที่ใช้ใน bcrypt (เรียกจาก app.auth.handler_auth)
+
+label route ใช้ path template ของ route (เช่น /tax/{province}) ไม่ใช่ path จริง
+เพื่อไม่ให้จำนวน series โตตามข้อมูล
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name + _labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = float(value)
+
+    def dec(self, *labels, amount=1.0):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [จำนวนต่อ bucket (ไม่สะสม) ..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        names = self.labelnames + ("le",)
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield self.name + "_bucket" + _labels(names, labels + (le,)), cumulative
+            yield self.name + "_sum" + _labels(self.labelnames, labels), series[-2]
+            yield self.name + "_count" + _labels(self.labelnames, labels), series[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name} {value:g}" for name, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+LATENCY = registry.register(Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route")))
+IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "HTTP requests currently being served."))
+DB_QUERIES = registry.register(Histogram("http_request_db_queries", "SQL statements issued per request.", ("route",), QUERY_COUNT_BUCKETS))
+DB_SECONDS = registry.register(Histogram("http_request_db_seconds", "Time spent in SQL per request.", ("route",)))
+PASSWORD_HASH = registry.register(Histogram("password_hash_duration_seconds", "Time spent in bcrypt.", ("operation",)))
+
+# สถิติ SQL ของ request ปัจจุบัน [จำนวน, วินาที] (object เดียวถูกแชร์ไปยัง thread/greenlet ที่รัน query)
+_request_db = ContextVar("request_db", default=None)
+
+
+def observe_password_hash(operation: str, seconds: float) -> None:
+    PASSWORD_HASH.observe(seconds, operation)
+
+
+def _record_query(context) -> None:
+    start = getattr(context, "_metrics_start", None)
+    stats = _request_db.get()
+    if start is not None and stats is not None:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - start
+
+
+def instrument_engine(sync_engine) -> None:
+    # เก็บเวลาเริ่มไว้บน execution context (เหมือน app.profiling) ซึ่งหายไปพร้อม statement
+    # statement ที่ error จึงไม่ทิ้งค่าค้างไว้บน connection ที่ถูกใช้ซ้ำใน pool
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _record_query(context)
+
+    # statement ที่ error ก็ใช้เวลาฐานข้อมูล นับรวมด้วย
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        _record_query(exception_context.execution_context)
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware แบบบาง (ไม่ใช้ BaseHTTPMiddleware เพื่อไม่ให้เพิ่ม task ต่อ request)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = [0, 0.0]
+        token = _request_db.set(stats)
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            _request_db.reset(token)
+            route = route_label(scope)
+            REQUESTS.inc(scope["method"], route, status)
+            LATENCY.observe(elapsed, scope["method"], route)
+            DB_QUERIES.observe(stats[0], route)
+            DB_SECONDS.observe(stats[1], route)
@@ -1,3 +1,6 @@
 from .user_model import User
 from .travel_model import Travel
 from .tax_model import Tax
+from .stats_model import StatCounter, DailyRegistration
+from .cache_version_model import CacheVersion
+from .token_model import RefreshToken, RevokedToken
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+class CacheVersion(Base):
+    """เลข version ต่อชุดข้อมูล เพิ่มขึ้นใน transaction เดียวกับการเขียน (ดู app.cache_sync)"""
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
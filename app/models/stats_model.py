@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, Float, Date
+from app.database import Base
+
+class StatCounter(Base):
+    """ตัวนับสะสมต่อตาราง (taxes, travels, users) อัปเดตใน transaction เดียวกับการ insert"""
+    __tablename__ = "stat_counters"
+    name = Column(String, primary_key=True)          # ชื่อตาราง
+    total = Column(Integer, nullable=False, default=0)
+    secondary = Column(Integer, nullable=False, default=0)
+    rate_count = Column(Integer, nullable=False, default=0)  # จำนวนแถวที่มีอัตราลดหย่อน (ไม่เป็น null)
+    rate_sum = Column(Float, nullable=False, default=0.0)
+    rate_min = Column(Float, nullable=True)
+    rate_max = Column(Float, nullable=True)
+
+class DailyRegistration(Base):
+    """จำนวนผู้ใช้ที่สมัครในแต่ละวัน (UTC) บันทึกตอนสมัคร"""
+    __tablename__ = "daily_registrations"
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+class RefreshToken(Base):
+    """refresh token ที่ออกไปแล้ว ใช้ได้ครั้งเดียว (rotation) ทุกใบที่สืบจาก login เดียวกันอยู่ใน family เดียวกัน"""
+    __tablename__ = "refresh_tokens"
+    jti = Column(String, primary_key=True)
+    family = Column(String, index=True, nullable=False)
+    username = Column(String, index=True, nullable=False)
+    expires_at = Column(Integer, nullable=False)          # unix time
+    access_jti = Column(String, nullable=False)           # access token ที่ออกคู่กัน
+    access_expires_at = Column(Integer, nullable=False)
+    used = Column(Integer, nullable=False, default=0)     # 1 = ถูกแลกเป็นคู่ใหม่แล้ว
+    revoked = Column(Integer, nullable=False, default=0)
+
+class RevokedToken(Base):
+    """jti ของ access token ที่ถูกเพิกถอนก่อนหมดอายุ (ลบได้เมื่อพ้น expires_at)"""
+    __tablename__ = "revoked_tokens"
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, nullable=False)
+    expires_at = Column(Integer, nullable=False)
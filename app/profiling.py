@@ -0,0 +1,161 @@
+"""profile ทีละ request บน production แบบเลือกเปิด
+
+request จะถูก profile เมื่อ
+- ส่ง header X-Profile ที่มีค่าตรงกับ PROFILING_TOKEN หรือ
+- ถูกสุ่มตาม PROFILE_SAMPLE_RATE (0.0 - 1.0)
+
+cProfile ครอบทั้ง dependency (get_session, get_current_user) และฟังก์ชันของ router
+พร้อมบันทึก SQL ที่ request นั้นสั่ง ผลเก็บใน profile_store และดาวน์โหลดได้ที่ /debug/profiles
+(ไฟล์ .prof เปิดด้วย pstats หรือ snakeviz ได้) response ที่ถูก profile จะมี header X-Profile-Id
+
+ข้อจำกัด: cProfile จับเฉพาะ thread ของ event loop งานใน threadpool (DB โหมด sync, bcrypt)
+จะเห็นเป็นเวลารอ และ coroutine ของ request อื่นที่รันสลับกันระหว่างนั้นอาจปนมาด้วย
+จึง profile ได้ทีละ request เท่านั้น
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from app.config import PROFILING_TOKEN, PROFILE_SAMPLE_RATE, PROFILE_STORE_SIZE
+
+PROFILE_HEADER = b"x-profile"
+
+# SQL ของ request ที่กำลังถูก profile (None = ไม่ได้ profile ไม่ต้องบันทึก)
+_statements = ContextVar("profile_statements", default=None)
+_busy = threading.Lock()
+
+
+class ProfileStore:
+    """เก็บ profile ล่าสุดไม่เกิน max_size รายการ"""
+
+    def __init__(self, max_size: int = PROFILE_STORE_SIZE):
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, record: dict) -> None:
+        with self._lock:
+            self._items[record["id"]] = record
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def get(self, profile_id: str):
+        with self._lock:
+            return self._items.get(profile_id)
+
+    def list(self) -> list:
+        with self._lock:
+            records = list(self._items.values())
+        return [{k: v for k, v in record.items() if k not in ("data", "statements")} for record in reversed(records)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+profile_store = ProfileStore()
+
+
+def instrument_engine(sync_engine) -> None:
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _statements.get() is not None and context is not None:
+            context._profile_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        statements = _statements.get()
+        if statements is not None:
+            start = getattr(context, "_profile_start", None)
+            elapsed = time.perf_counter() - start if start is not None else None
+            statements.append({"sql": statement, "executemany": executemany, "seconds": elapsed})
+
+
+def stats_text(data: bytes, sort: str = "cumulative", limit: int = 40) -> str:
+    """สรุป profile เป็นข้อความแบบ pstats"""
+    stream = io.StringIO()
+    stats = pstats.Stats(_Loaded(marshal.loads(data)), stream=stream)
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+class _Loaded:
+    # pstats.Stats รับ object ที่มีเมธอด create_stats และ attribute stats ได้
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _should_profile(scope) -> bool:
+    if PROFILING_TOKEN:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return value.decode("latin-1") == PROFILING_TOKEN
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # ทางปกติ: ไม่เปิดใช้ หรือ request นี้ไม่ถูกเลือก -> ส่งต่อทันที
+        if scope["type"] != "http" or not (PROFILING_TOKEN or PROFILE_SAMPLE_RATE) or not _should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        if not _busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            _busy.release()
+
+    async def _profile(self, scope, receive, send):
+        profile_id = uuid.uuid4().hex
+        status = 500
+        statements = []
+        token = _statements.set(statements)
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            _statements.reset(token)
+            profiler.create_stats()
+            route = scope.get("route")
+            profile_store.add({
+                "id": profile_id,
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status,
+                "seconds": round(elapsed, 6),
+                "query_count": len(statements),
+                "statements": statements,
+                "data": marshal.dumps(profiler.stats),
+            })
@@ -0,0 +1,84 @@
+"""ชื่อจังหวัดภาษาไทยและชื่อที่เขียนด้วยอักษรโรมัน (ราชบัณฑิตยสถาน และชื่อที่นิยมใช้)
+
+ใช้โดย app.search เพื่อให้ค้น "Chiang Mai" แล้วเจอ "เชียงใหม่" (และกลับกัน)
+"""
+
+PROVINCE_ALIASES = (
+    ("กรุงเทพมหานคร", "กรุงเทพ", "Bangkok", "Krung Thep"),
+    ("กระบี่", "Krabi"),
+    ("กาญจนบุรี", "Kanchanaburi"),
+    ("กาฬสินธุ์", "Kalasin"),
+    ("กำแพงเพชร", "Kamphaeng Phet"),
+    ("ขอนแก่น", "Khon Kaen"),
+    ("จันทบุรี", "Chanthaburi"),
+    ("ฉะเชิงเทรา", "Chachoengsao"),
+    ("ชลบุรี", "Chon Buri", "Chonburi"),
+    ("ชัยนาท", "Chai Nat", "Chainat"),
+    ("ชัยภูมิ", "Chaiyaphum"),
+    ("ชุมพร", "Chumphon"),
+    ("เชียงราย", "Chiang Rai"),
+    ("เชียงใหม่", "Chiang Mai"),
+    ("ตรัง", "Trang"),
+    ("ตราด", "Trat"),
+    ("ตาก", "Tak"),
+    ("นครนายก", "Nakhon Nayok"),
+    ("นครปฐม", "Nakhon Pathom"),
+    ("นครพนม", "Nakhon Phanom"),
+    ("นครราชสีมา", "Nakhon Ratchasima", "Korat", "โคราช"),
+    ("นครศรีธรรมราช", "Nakhon Si Thammarat"),
+    ("นครสวรรค์", "Nakhon Sawan"),
+    ("นนทบุรี", "Nonthaburi"),
+    ("นราธิวาส", "Narathiwat"),
+    ("น่าน", "Nan"),
+    ("บึงกาฬ", "Bueng Kan"),
+    ("บุรีรัมย์", "Buri Ram", "Buriram"),
+    ("ปทุมธานี", "Pathum Thani"),
+    ("ประจวบคีรีขันธ์", "Prachuap Khiri Khan"),
+    ("ปราจีนบุรี", "Prachin Buri", "Prachinburi"),
+    ("ปัตตานี", "Pattani"),
+    ("พระนครศรีอยุธยา", "อยุธยา", "Phra Nakhon Si Ayutthaya", "Ayutthaya"),
+    ("พะเยา", "Phayao"),
+    ("พังงา", "Phang Nga"),
+    ("พัทลุง", "Phatthalung"),
+    ("พิจิตร", "Phichit"),
+    ("พิษณุโลก", "Phitsanulok"),
+    ("เพชรบุรี", "Phetchaburi"),
+    ("เพชรบูรณ์", "Phetchabun"),
+    ("แพร่", "Phrae"),
+    ("ภูเก็ต", "Phuket"),
+    ("มหาสารคาม", "Maha Sarakham"),
+    ("มุกดาหาร", "Mukdahan"),
+    ("แม่ฮ่องสอน", "Mae Hong Son"),
+    ("ยโสธร", "Yasothon"),
+    ("ยะลา", "Yala"),
+    ("ร้อยเอ็ด", "Roi Et"),
+    ("ระนอง", "Ranong"),
+    ("ระยอง", "Rayong"),
+    ("ราชบุรี", "Ratchaburi"),
+    ("ลพบุรี", "Lop Buri", "Lopburi"),
+    ("ลำปาง", "Lampang"),
+    ("ลำพูน", "Lamphun"),
+    ("เลย", "Loei"),
+    ("ศรีสะเกษ", "Si Sa Ket", "Sisaket"),
+    ("สกลนคร", "Sakon Nakhon"),
+    ("สงขลา", "Songkhla"),
+    ("สตูล", "Satun"),
+    ("สมุทรปราการ", "Samut Prakan"),
+    ("สมุทรสงคราม", "Samut Songkhram"),
+    ("สมุทรสาคร", "Samut Sakhon"),
+    ("สระแก้ว", "Sa Kaeo"),
+    ("สระบุรี", "Saraburi"),
+    ("สิงห์บุรี", "Sing Buri", "Singburi"),
+    ("สุโขทัย", "Sukhothai"),
+    ("สุพรรณบุรี", "Suphan Buri", "Suphanburi"),
+    ("สุราษฎร์ธานี", "Surat Thani"),
+    ("สุรินทร์", "Surin"),
+    ("หนองคาย", "Nong Khai"),
+    ("หนองบัวลำภู", "Nong Bua Lam Phu"),
+    ("อ่างทอง", "Ang Thong"),
+    ("อำนาจเจริญ", "Amnat Charoen"),
+    ("อุดรธานี", "Udon Thani"),
+    ("อุตรดิตถ์", "Uttaradit"),
+    ("อุทัยธานี", "Uthai Thani"),
+    ("อุบลราชธานี", "Ubon Ratchathani"),
+)
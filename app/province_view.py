@@ -0,0 +1,89 @@
+"""มุมมองรายละเอียดจังหวัดที่ join travels กับ taxes ไว้ล่วงหน้าในหน่วยความจำ
+
+แต่ละจังหวัด (ที่มีในตารางใดตารางหนึ่ง) มีข้อมูล travel, tax และกติกาลดหย่อนที่ใช้จริง
+- มีแถวใน taxes: ใช้ reduce_tax_percent และ is_secondary ของ tax (ตารางหลักของกติกาภาษี)
+- ไม่มี: ใช้ tax_reduction ของ travel แทน
+
+มุมมองสร้างจาก catalog snapshot ครั้งแรกที่ถูกเรียก หลังจากนั้นคำนวณใหม่เฉพาะจังหวัดที่ถูก put()
+และสร้างใหม่ทั้งหมดเมื่อ catalog ถูก invalidate
+"""
+import threading
+
+from app.catalog import tax_catalog, travel_catalog
+
+# สร้างใหม่ได้กี่ครั้งถ้ามีการเขียนแทรกระหว่างสร้าง ก่อนตอบด้วยผลล่าสุดโดยไม่ติดตั้ง
+MAX_BUILD_ATTEMPTS = 5
+
+
+def build_detail(province: str, travel, tax) -> dict:
+    if tax is not None:
+        effective, is_secondary, source = tax["reduce_tax_percent"], tax["is_secondary"], "tax"
+    elif travel is not None and travel["tax_reduction"] is not None:
+        effective, is_secondary, source = travel["tax_reduction"], travel["is_secondary"], "travel"
+    else:
+        effective, is_secondary, source = None, travel["is_secondary"] if travel else None, None
+    return {
+        "province": province,
+        "effective_tax_percent": effective,
+        "is_secondary": is_secondary,
+        "tax_rule_source": source,
+        "travel": travel,
+        "tax": tax,
+    }
+
+
+class ProvinceDetailView:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._built = False
+        self._travel, self._tax, self._details = {}, {}, {}
+        travel_catalog.subscribe(lambda row: self._on_change(self._travel, row))
+        tax_catalog.subscribe(lambda row: self._on_change(self._tax, row))
+
+    def _refresh(self, province: str) -> None:
+        # แทนที่ทั้ง entry ผู้อ่านจึงเห็นแต่ค่าเก่าหรือใหม่ทั้งก้อน
+        travel, tax = self._travel.get(province), self._tax.get(province)
+        if travel is None and tax is None:
+            self._details.pop(province, None)
+        else:
+            self._details[province] = build_detail(province, travel, tax)
+
+    def _on_change(self, table: dict, row) -> None:
+        with self._lock:
+            # ทุกการเปลี่ยน (รวม put) ทำให้มุมมองที่กำลังสร้างอยู่ต้องสร้างใหม่
+            self._generation += 1
+            if row is None:
+                self._built = False
+                self._travel, self._tax, self._details = {}, {}, {}
+            elif self._built:
+                # แถวเดิมของ id นี้อาจเคยใช้ชื่อจังหวัดอื่น
+                stale = [name for name, old in table.items() if old["id"] == row["id"] and name != row["province"]]
+                for name in stale:
+                    del table[name]
+                    self._refresh(name)
+                table[row["province"]] = row
+                self._refresh(row["province"])
+
+    async def details(self, db) -> dict:
+        """dict ของ ชื่อจังหวัด -> รายละเอียด (สร้างจาก catalog ถ้ายังไม่มี)"""
+        for _ in range(MAX_BUILD_ATTEMPTS):
+            if self._built:
+                return self._details
+            generation = self._generation
+            travel = dict((await travel_catalog.snapshot_async(db)).by_province)
+            tax = dict((await tax_catalog.snapshot_async(db)).by_province)
+            details = {
+                province: build_detail(province, travel.get(province), tax.get(province))
+                for province in travel.keys() | tax.keys()
+            }
+            with self._lock:
+                # ติดตั้งเฉพาะเมื่อไม่มี put/invalidate ระหว่างโหลด ไม่เช่นนั้นสร้างใหม่จาก snapshot ล่าสุด
+                if not self._built and generation == self._generation:
+                    self._travel, self._tax, self._details = travel, tax, details
+                    self._built = True
+                    return details
+        return details
+
+
+province_view = ProvinceDetailView()
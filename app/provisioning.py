@@ -0,0 +1,104 @@
+"""สมัครผู้ใช้ทีละมากๆ จากไฟล์ CSV/NDJSON (POST /register/bulk และ python -m app.cli import-users)
+
+แต่ละชุด (chunk) ของบรรทัด
+1. parse และ validate ด้วย UserCreate (ใช้ตัวอ่านเดียวกับ BulkImporter)
+2. ตัด username ที่ซ้ำในไฟล์ และที่มีอยู่แล้วด้วย query เดียว (WHERE username IN (...))
+3. hash รหัสผ่านพร้อมกันหลาย thread (bcrypt ปล่อย GIL)
+4. insert ทั้งชุดใน transaction เดียว แถวที่ชนกับการสมัครที่แทรกเข้ามาระหว่างนั้น
+   ถูกข้าม (ON CONFLICT DO NOTHING) และรายงานเป็น error ของแถวนั้น
+
+ผู้ใช้ที่ commit แล้วไม่ถูกย้อนกลับเมื่อชุดถัดไปผิดพลาด
+"""
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app import stats
+from app.auth.handler_auth import hash_passwords, hash_passwords_async
+from app.bulk import BulkImporter, iter_file_chunks, iter_line_chunks
+from app.database import dialect_insert, release_connection, run_write
+from app.models import User
+from app.schemas import UserCreate
+
+
+class UserProvisioner(BulkImporter):
+    def __init__(self, fmt: str = "ndjson"):
+        super().__init__(User, UserCreate, fmt)
+        self.created = 0
+        self._usernames = {}  # username ที่พบในไฟล์แล้ว -> หมายเลขแถว
+
+    def prepare(self, db: Session, lines) -> list:
+        """คืน list ของ (หมายเลขแถว, dict ของ UserCreate) ที่ยังไม่มีในไฟล์และในฐานข้อมูล"""
+        rows, row_numbers = self._validate(self._parse(lines))
+        candidates = []
+        for row_number, row in zip(row_numbers, rows):
+            first = self._usernames.setdefault(row["username"], row_number)
+            if first != row_number:
+                self.errors.append({"row": row_number, "error": f"Duplicate username in file (row {first})"})
+            else:
+                candidates.append((row_number, row))
+        if candidates:
+            existing = set(db.scalars(select(User.username).where(User.username.in_([row["username"] for _, row in candidates]))))
+            release_connection(db)
+            for row_number, row in candidates:
+                if row["username"] in existing:
+                    self.errors.append({"row": row_number, "error": "Username already exists"})
+            candidates = [(n, row) for n, row in candidates if row["username"] not in existing]
+        return candidates
+
+    def insert(self, db: Session, candidates, hashes) -> None:
+        """insert หนึ่งชุดพร้อม hash ที่คำนวณแล้ว และ commit"""
+        values = [
+            {"username": row["username"], "hashed_password": hashed, "fullname": row["fullname"], "phone": row["phone"]}
+            for (_, row), hashed in zip(candidates, hashes)
+        ]
+        stmt = dialect_insert(db)(User).on_conflict_do_nothing(index_elements=["username"]).returning(User.username)
+        try:
+            inserted = set(db.scalars(stmt, values))
+            stats.record_registrations(db, len(inserted))
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            message = f"Database error: {e.orig if getattr(e, 'orig', None) else e}"
+            self.errors.extend({"row": n, "error": message} for n, _ in candidates)
+            return
+        self.created += len(inserted)
+        self.errors.extend(
+            {"row": n, "error": "Username already exists"} for n, row in candidates if row["username"] not in inserted
+        )
+
+    def progress(self) -> dict:
+        return {"processed": self.processed, "created": self.created, "failed": len(self.errors)}
+
+    def report(self) -> dict:
+        return {
+            "processed": self.processed,
+            "created": self.created,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
+
+
+async def provision_stream(db, provisioner: UserProvisioner, byte_stream, chunk_size: int):
+    """สมัครผู้ใช้จาก body ที่ stream เข้ามา yield ความคืบหน้าหลังแต่ละชุด แล้วปิด session"""
+    try:
+        async for lines in iter_line_chunks(byte_stream, chunk_size):
+            candidates = await db.run_sync(provisioner.prepare, lines)
+            if candidates:
+                hashes = await hash_passwords_async([row["password"] for _, row in candidates])
+                await run_write(db, provisioner.insert, candidates, hashes)
+            yield provisioner.progress()
+    finally:
+        await db.close()
+
+
+def provision_file(db: Session, path: str, fmt: str, chunk_size: int, executor, on_progress=None) -> dict:
+    """เหมือน provision_stream แต่อ่านจากไฟล์ (ใช้จาก app.cli)"""
+    provisioner = UserProvisioner(fmt)
+    with open(path, "rb") as file:
+        for lines in iter_file_chunks(file, chunk_size):
+            candidates = provisioner.prepare(db, lines)
+            if candidates:
+                provisioner.insert(db, candidates, hash_passwords([row["password"] for _, row in candidates], executor))
+            if on_progress is not None:
+                on_progress(provisioner.progress())
+    return provisioner.report()
@@ -0,0 +1,214 @@
+"""จำกัดจำนวนครั้งการ login ก่อนถึงงานที่แพง (query ผู้ใช้และ bcrypt)
+
+- token bucket ต่อ IP และต่อ username: ได้ burst ตามจำนวน token แล้วเติมตามอัตราต่อนาที
+- lockout แบบก้าวหน้าต่อ username: ผิดครบ LOGIN_LOCKOUT_THRESHOLD ครั้ง ถูกล็อก
+  LOGIN_LOCKOUT_BASE_SECONDS และเพิ่มเป็นสองเท่าทุกครั้งที่ผิดต่อ (ไม่เกิน LOGIN_LOCKOUT_MAX_SECONDS)
+  login สำเร็จหรือไม่ผิดเลยนาน LOGIN_FAILURE_WINDOW_SECONDS จะเริ่มนับใหม่
+
+state อยู่ใน backend ที่เปลี่ยนได้ด้วย RATE_LIMIT_BACKEND
+- "memory": ใน process (ค่าเริ่มต้น) จำกัดจำนวน key ด้วย LRU
+- "sqlite": ไฟล์ SQLite ที่ทุก worker ใช้ร่วมกัน (RATE_LIMIT_SQLITE_PATH)
+
+IP มาจาก request.client ถ้าอยู่หลัง proxy ให้รัน uvicorn ด้วย --proxy-headers
+"""
+import contextlib
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from app.config import (
+    LOGIN_RATE_LIMIT_ENABLED, LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE, LOGIN_USER_BURST, LOGIN_USER_PER_MINUTE,
+    LOGIN_LOCKOUT_THRESHOLD, LOGIN_LOCKOUT_BASE_SECONDS, LOGIN_LOCKOUT_MAX_SECONDS, LOGIN_FAILURE_WINDOW_SECONDS,
+    RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_MAX_KEYS,
+)
+
+
+def refill(tokens, updated, capacity, per_second, now):
+    """token หลังเติมถึงเวลา now (bucket ใหม่เริ่มเต็ม)"""
+    if tokens is None:
+        return float(capacity)
+    return min(float(capacity), tokens + (now - updated) * per_second)
+
+
+def take_token(tokens, per_second):
+    """คืน (token ที่เหลือ, วินาทีที่ต้องรอ) โดยรอ 0 = ผ่าน"""
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / per_second
+
+
+def lockout_seconds(failures: int) -> float:
+    if failures < LOGIN_LOCKOUT_THRESHOLD:
+        return 0.0
+    return min(LOGIN_LOCKOUT_MAX_SECONDS, LOGIN_LOCKOUT_BASE_SECONDS * 2 ** (failures - LOGIN_LOCKOUT_THRESHOLD))
+
+
+class MemoryBackend:
+    blocking = False
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()   # key -> (tokens, updated)
+        self._failures = OrderedDict()  # username -> (failures, locked_until, updated)
+        self._lock = threading.Lock()
+
+    def _store(self, table, key, value):
+        table[key] = value
+        table.move_to_end(key)
+        while len(table) > self.max_keys:
+            table.popitem(last=False)
+
+    def take(self, key, capacity, per_second, now) -> float:
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, now))
+            tokens, wait = take_token(refill(tokens, updated, capacity, per_second, now), per_second)
+            self._store(self._buckets, key, (tokens, now))
+            return wait
+
+    def locked_until(self, username, now) -> float:
+        with self._lock:
+            return self._failures.get(username, (0, 0.0, now))[1]
+
+    def record_failure(self, username, now) -> float:
+        with self._lock:
+            failures, _, updated = self._failures.get(username, (0, 0.0, now))
+            if now - updated > LOGIN_FAILURE_WINDOW_SECONDS:
+                failures = 0
+            failures += 1
+            locked_until = now + lockout_seconds(failures)
+            self._store(self._failures, username, (failures, locked_until, now))
+            return locked_until
+
+    def reset(self, username) -> None:
+        with self._lock:
+            self._failures.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._failures.clear()
+
+
+class SQLiteBackend:
+    """state ในไฟล์ SQLite ใช้ร่วมกันได้หลาย worker ทุกการอ่าน-แก้-เขียนอยู่ใน BEGIN IMMEDIATE"""
+
+    blocking = True
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS login_buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS login_failures "
+                "(username TEXT PRIMARY KEY, failures INTEGER, locked_until REAL, updated REAL)"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def take(self, key, capacity, per_second, now) -> float:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT tokens, updated FROM login_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (None, now)
+            tokens, wait = take_token(refill(tokens, updated, capacity, per_second, now), per_second)
+            conn.execute("INSERT OR REPLACE INTO login_buckets VALUES (?, ?, ?)", (key, tokens, now))
+            return wait
+
+    def locked_until(self, username, now) -> float:
+        row = self._connection().execute(
+            "SELECT locked_until FROM login_failures WHERE username = ?", (username,)
+        ).fetchone()
+        return row[0] if row else 0.0
+
+    def record_failure(self, username, now) -> float:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT failures, updated FROM login_failures WHERE username = ?", (username,)
+            ).fetchone()
+            failures = row[0] if row and now - row[1] <= LOGIN_FAILURE_WINDOW_SECONDS else 0
+            failures += 1
+            locked_until = now + lockout_seconds(failures)
+            conn.execute("INSERT OR REPLACE INTO login_failures VALUES (?, ?, ?, ?)", (username, failures, locked_until, now))
+            return locked_until
+
+    def reset(self, username) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM login_failures WHERE username = ?", (username,))
+
+    def clear(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM login_buckets")
+            conn.execute("DELETE FROM login_failures")
+
+
+BACKENDS = {"memory": MemoryBackend, "sqlite": SQLiteBackend}
+
+
+def _too_many(wait: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts, please retry later",
+        headers={"Retry-After": str(max(1, math.ceil(wait)))},
+    )
+
+
+class LoginLimiter:
+    def __init__(self, backend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+
+    async def _call(self, fn, *args):
+        # backend ที่ต้องรอ I/O (sqlite) รันบน threadpool ส่วน memory เรียกตรงๆ
+        if self.backend.blocking:
+            return await run_in_threadpool(fn, *args)
+        return fn(*args)
+
+    async def check(self, ip: str | None, username: str) -> None:
+        """เรียกก่อน query ผู้ใช้และ bcrypt ถ้าเกินกำหนดจะ raise 429 พร้อม Retry-After"""
+        if not self.enabled:
+            return
+        now = time.time()
+        username = username.lower()
+        locked_until = await self._call(self.backend.locked_until, username, now)
+        if locked_until > now:
+            raise _too_many(locked_until - now)
+        if ip:
+            wait = await self._call(self.backend.take, f"ip:{ip}", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60, now)
+            if wait:
+                raise _too_many(wait)
+        wait = await self._call(self.backend.take, f"user:{username}", LOGIN_USER_BURST, LOGIN_USER_PER_MINUTE / 60, now)
+        if wait:
+            raise _too_many(wait)
+
+    async def failed(self, username: str) -> None:
+        if self.enabled:
+            await self._call(self.backend.record_failure, username.lower(), time.time())
+
+    async def succeeded(self, username: str) -> None:
+        if self.enabled:
+            await self._call(self.backend.reset, username.lower())
+
+
+login_limiter = LoginLimiter(BACKENDS[RATE_LIMIT_BACKEND](), enabled=bool(LOGIN_RATE_LIMIT_ENABLED))
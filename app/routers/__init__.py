@@ -2,3 +2,9 @@ from .register_routers import router as register_router
 from .login_router import router as login_router
 from .travel_router import router as travel_router
 from .tax_router import router as tax_router
+from .search_router import router as search_router
+from .province_router import router as province_router
+from .profile_router import router as profile_router
+
+from .stats_router import router as stats_router
+from .token_router import router as token_router
\ No newline at end of file
@@ -1,29 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status # เพิ่ม status
+from fastapi import APIRouter, Depends, HTTPException, Request, status # เพิ่ม status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError # <-- นำเข้า IntegrityError
-from app.schemas.user_schemas import UserCreate, UserLogin, UserResponse
+from app.schemas import UserCreate, UserLogin, UserResponse
 from app.models.user_model import User
-from app.database import get_db
-from app.auth import hash_password, verify_password, create_access_token
+from app.database import get_session, run_write, release_connection
+from app.auth import hash_password_async, verify_password_async
+from app.auth.token__service import issue_tokens
+from app.rate_limit import login_limiter
+from app import stats
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED) # <-- เปลี่ยนเป็น 201 Created
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db=Depends(get_session)):
     # ตรวจสอบ username ซ้ำ (จากโค้ดเดิมของคุณ)
-    db_user = db.query(User).filter(User.username == user.username).first()
+    db_user = await db.run_sync(_find_user, user.username)
     if db_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists") # <-- ใช้ status.HTTP_400_BAD_REQUEST
 
+    # อยู่นอก try เพื่อให้ 503 จาก password pool ส่งถึง client ตรงๆ
+    hashed_pw = await hash_password_async(user.password)
+    new_user = User(
+        fullname=user.fullname,
+        phone=user.phone,
+        username=user.username,
+        hashed_password=hashed_pw
+    )
+    return await run_write(db, _insert_user, new_user)
+
+def _find_user(db: Session, username: str):
+    user = db.query(User).filter(User.username == username).first()
+    release_connection(db)
+    return user
+
+def _insert_user(db: Session, new_user: User):
     try:
-        hashed_pw = hash_password(user.password)
-        new_user = User(
-            fullname=user.fullname,
-            phone=user.phone,
-            username=user.username,
-            hashed_password=hashed_pw
-        )
         db.add(new_user)
+        db.flush() # <-- ชน UNIQUE ที่นี่ก่อนนับสถิติ
+        stats.record_registration(db, new_user)
         db.commit() # <-- commit การเปลี่ยนแปลงลงฐานข้อมูล
         db.refresh(new_user) # <-- refresh เพื่อให้ได้ ID และข้อมูลล่าสุดจาก DB
         return new_user
@@ -40,11 +54,22 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
             detail=f"An unexpected error occurred during registration: {e}"
         )
 
+def _store_hash(db: Session, db_user: User, new_hash: str):
+    db_user.hashed_password = new_hash
+    db.commit()
+
 @router.post("/login", status_code=status.HTTP_200_OK) # <-- กำหนด status_code เป็น 200 OK
-def login_user(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def login_user(user: UserLogin, request: Request, db=Depends(get_session)):
+    await login_limiter.check(request.client.host if request.client else None, user.username)
+    db_user = await db.run_sync(_find_user, user.username)
+    verified, new_hash = False, None
+    if db_user:
+        verified, new_hash = await verify_password_async(user.password, db_user.hashed_password)
+    if not verified:
+        await login_limiter.failed(user.username)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials") # <-- ใช้ status.HTTP_401_UNAUTHORIZED
-    
-    access_token = create_access_token({"sub": user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    await login_limiter.succeeded(user.username)
+    if new_hash:
+        await run_write(db, _store_hash, db_user, new_hash)
+
+    return await run_write(db, issue_tokens, user.username)
\ No newline at end of file
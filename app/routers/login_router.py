@@ -1,37 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
 from app.models import User
-from app.database import SessionLocal
-from app.auth import verify_password, create_access_token
+from app.database import get_session, run_write, release_connection
+from app.auth import verify_password_async
+from app.auth.token__service import issue_tokens
 from app.schemas import Token
+from app.rate_limit import login_limiter
 
 router = APIRouter(
     prefix="/login",
     tags=["Login"]
 )
 
-# ใช้สำหรับให้ FastAPI ใช้ session กับ DB
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _find_user(db: Session, username: str):
+    user = db.query(User).filter(User.username == username).first()
+    release_connection(db)
+    return user
+
+def _store_hash(db: Session, user: User, new_hash: str):
+    user.hashed_password = new_hash
+    db.commit()
 
 @router.post("/", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_session)):
+    # ตัดคำขอที่ถี่เกินก่อนแตะฐานข้อมูลหรือ bcrypt
+    await login_limiter.check(request.client.host if request.client else None, form_data.username)
+    user = await db.run_sync(_find_user, form_data.username)
+
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await verify_password_async(form_data.password, user.hashed_password)
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not verified:
+        await login_limiter.failed(form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    access_token = create_access_token(data={"sub": user.username})
-    return {
-        "access_token": access_token,
-        "token_type": "bearer"
-    }
+    await login_limiter.succeeded(form_data.username)
+
+    # hash เดิมใช้ cost ที่ไม่ตรงกับ BCRYPT_ROUNDS -> เก็บ hash ใหม่แทน
+    if new_hash:
+        await run_write(db, _store_hash, user, new_hash)
+
+    # access token อายุสั้น + refresh token สำหรับ /token/refresh (ไม่ต้องผ่าน bcrypt อีก)
+    return await run_write(db, issue_tokens, user.username)
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+
+from app import profiling
+from app.profiling import profile_store, stats_text
+
+router = APIRouter(prefix="/debug/profiles", tags=["Debug"], include_in_schema=False)
+
+
+def require_profiling_token(x_profile: str | None = Header(None)):
+    # ไม่ได้ตั้ง PROFILING_TOKEN = ปิด endpoint นี้ทั้งหมด
+    if not profiling.PROFILING_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_profile != profiling.PROFILING_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid profiling token")
+
+
+def _get_profile(profile_id: str) -> dict:
+    record = profile_store.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return record
+
+
+@router.get("/", dependencies=[Depends(require_profiling_token)])
+async def list_profiles():
+    return profile_store.list()
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_profiling_token)])
+async def get_profile(profile_id: str, sort: str = Query("cumulative"), limit: int = Query(40, ge=1, le=1000)):
+    """ข้อมูลของ profile, SQL ที่ request สั่ง และสรุปแบบ pstats"""
+    record = _get_profile(profile_id)
+    try:
+        summary = stats_text(record["data"], sort, limit)
+    except KeyError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unknown sort key: {sort}")
+    return {**{k: v for k, v in record.items() if k != "data"}, "stats": summary}
+
+
+@router.get("/{profile_id}/download", dependencies=[Depends(require_profiling_token)])
+async def download_profile(profile_id: str):
+    """ไฟล์ .prof (รูปแบบเดียวกับ cProfile.dump_stats)"""
+    record = _get_profile(profile_id)
+    return Response(
+        record["data"],
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'},
+    )
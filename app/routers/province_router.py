@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.database import get_session
+from app.province_view import province_view
+from app.schemas.province_schemas import ProvinceBatchRequest, ProvinceDetail, ProvinceDetailBatch
+
+router = APIRouter(prefix="/provinces", tags=["Provinces"])
+
+# ข้อมูล travel + กติกาภาษีของหลายจังหวัดในคำขอเดียว (ประกาศก่อน /{province})
+@router.post("/batch", response_model=ProvinceDetailBatch)
+async def get_province_details(request: ProvinceBatchRequest, db=Depends(get_session)):
+    details = await province_view.details(db)
+    results = {province: details.get(province) for province in request.provinces}
+    return {"results": results, "not_found": [name for name, detail in results.items() if detail is None]}
+
+# ข้อมูล travel และกติกาภาษีที่ใช้จริงของจังหวัดเดียว แทนการเรียก /travel/{province} และ /tax/{province}
+@router.get("/{province}", response_model=ProvinceDetail)
+async def get_province_detail(province: str, db=Depends(get_session)):
+    detail = (await province_view.details(db)).get(province)
+    if detail is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Province not found")
+    return detail
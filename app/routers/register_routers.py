@@ -1,32 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.schemas import UserCreate, UserResponse
+from app.schemas import UserCreate, UserResponse, BulkUserReport
 from app.models import User
-from app.auth import get_password_hash
-from app.database import SessionLocal
+from app.auth import CurrentUser, get_admin_user, hash_password_async, release_bulk_hashes, reserve_bulk_hashes
+from app.bulk import detect_format, iter_spooled, spool_body
+from app.database import get_session, get_stream_session, run_write, release_connection
+from app.fast_json import dumps
+from app.provisioning import UserProvisioner, provision_stream
+from app import stats
 
 router = APIRouter(prefix="/register", tags=["Register"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def _username_exists(db: Session, username: str):
+    exists = db.query(User.id).filter(User.username == username).first() is not None
+    release_connection(db)
+    return exists
+
+def _insert_user(db: Session, new_user: User):
+    db.add(new_user)
+    db.flush()
+    stats.record_registration(db, new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
 
 @router.post("/", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if db_user:
+async def register(user: UserCreate, db=Depends(get_session)):
+    if await db.run_sync(_username_exists, user.username):
         raise HTTPException(status_code=400, detail="Username already exists")
-    hashed_pw = get_password_hash(user.password)
+    hashed_pw = await hash_password_async(user.password)
     new_user = User(
         username=user.username,
         hashed_password=hashed_pw,
         fullname=user.fullname,
         phone=user.phone
     )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
\ No newline at end of file
+    return await run_write(db, _insert_user, new_user)
+
+
+# สมัครผู้ใช้หลายคนจาก body แบบ CSV (text/csv มี header) หรือ NDJSON เฉพาะผู้ดูแล (ADMIN_USERNAMES)
+# แต่ละ request จองที่ hash chunk_size รหัสผ่านตลอดการทำงาน ถ้าเกิน BULK_HASH_QUEUE_LIMIT ตอบ 503
+# progress=true: ตอบเป็น NDJSON หนึ่งบรรทัดต่อชุด ({"processed", "created", "failed"}) และบรรทัดสุดท้ายเป็นรายงานเต็ม
+# (body ถูกพักไว้ในไฟล์ชั่วคราวก่อนเริ่มตอบ)
+@router.post("/bulk", response_model=BulkUserReport)
+async def bulk_register(
+    request: Request,
+    progress: bool = False,
+    chunk_size: int = Query(200, ge=1, le=5000),
+    current_user: CurrentUser = Depends(get_admin_user),
+    db=Depends(get_stream_session),
+):
+    provisioner = UserProvisioner(detect_format(request.headers.get("content-type")))
+    try:
+        reserve_bulk_hashes(chunk_size)
+    except HTTPException:
+        await db.close()
+        raise
+    if not progress:
+        try:
+            async for _ in provision_stream(db, provisioner, request.stream(), chunk_size):
+                pass
+        finally:
+            release_bulk_hashes(chunk_size)
+        return provisioner.report()
+    # อ่าน body ให้จบก่อนเริ่มตอบ (ดู spool_body) แล้ว stream เฉพาะบรรทัดความคืบหน้า
+    try:
+        spooled = await spool_body(request.stream())
+    except BaseException:
+        release_bulk_hashes(chunk_size)
+        await db.close()
+        raise
+
+    async def body():
+        try:
+            async for event in provision_stream(db, provisioner, iter_spooled(spooled), chunk_size):
+                yield dumps(event) + b"\n"
+            yield dumps(provisioner.report()) + b"\n"
+        finally:
+            release_bulk_hashes(chunk_size)
+            await spooled.close()
+
+    # ทำชุดแรกก่อนตอบ: generator ที่เริ่มแล้วถูก asyncio ปิด (คืนที่จองและ session) แม้ client หลุดก่อนส่ง body
+    events = body()
+    first = await events.__anext__()
+
+    async def chained():
+        yield first
+        async for line in events:
+            yield line
+    return StreamingResponse(chained(), media_type="application/x-ndjson")
@@ -0,0 +1,20 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query
+
+from app.database import get_session
+from app.schemas.search_schemas import ProvinceMatch
+from app.search import search_index
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+# ค้นชื่อจังหวัดแบบขึ้นต้นด้วย/สะกดใกล้เคียง ทั้งชื่อไทยและอักษรโรมัน เช่น q=chiang, q=เชียงใหม
+@router.get("/", response_model=list[ProvinceMatch])
+async def search_provinces(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=100),
+    source: Literal["tax", "travel"] | None = None,
+    db=Depends(get_session),
+):
+    names = await search_index.ensure(db)
+    return search_index.search(q, limit, source, names)
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, Query
+
+from app import stats
+from app.auth import CurrentUser, get_admin_user
+from app.database import get_session, run_write
+from app.schemas.stats_schemas import StatsResponse, ReconcileResponse
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+# สถิติรวมจากตัวนับที่อัปเดตตอน insert (ไม่ scan ตาราง) days = จำนวนวันย้อนหลังของยอดสมัครรายวัน
+@router.get("/", response_model=StatsResponse)
+async def get_stats(days: int = Query(30, ge=1, le=366), db=Depends(get_session)):
+    return await stats.get_stats(db, days)
+
+# สร้างตัวนับใหม่จากตาราง คืนชื่อตัวนับที่ค่าไม่ตรง (scan ทุกตาราง จึงให้เฉพาะผู้ดูแล)
+@router.post("/reconcile", response_model=ReconcileResponse)
+async def reconcile_stats(db=Depends(get_session), current_user: CurrentUser = Depends(get_admin_user)):
+    return {"reconciled": await run_write(db, stats.reconcile)}
@@ -1,24 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status # เพิ่ม status
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status # เพิ่ม status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError # <-- นำเข้า IntegrityError
-from app.schemas.tax_schemas import TaxCreate, TaxResponse
+from app.schemas.province_schemas import ProvinceBatchRequest
+from app.schemas.tax_schemas import TaxCreate, TaxResponse, TaxBatchResponse, TripCalculationRequest, TripCalculationResponse
+from app.schemas.bulk_schemas import BulkImportReport
+from app.fast_json import FastJSONResponse, raw_json_response
+from app.http_cache import catalog_cache_headers, not_modified_response
+from app.bulk import BulkImporter, detect_format, import_stream
+from app.export import export_response
+from app.calculator import calculate_deductions
 from app.models.tax_model import Tax
-from app.database import SessionLocal # หรือ get_db ถ้าคุณต้องการนำเข้า get_db โดยตรง
+from app.catalog import tax_catalog
+from app import cache_sync, stats
+from app.auth import CurrentUser, get_admin_user
+from app.database import get_session, get_stream_session, run_write # AsyncSession หรือ Session แบบ sync ตาม config.DB_MODE
 
 router = APIRouter(prefix="/tax", tags=["Tax"])
 
-# ให้แน่ใจว่าฟังก์ชัน get_db ของคุณถูกกำหนดใน app.database.py
-# และถูกนำเข้าอย่างถูกต้อง หรือถ้ามันถูกกำหนดในไฟล์เดียวกันนี้
-# ก็ไม่จำเป็นต้องเปลี่ยนแปลงอะไร
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/", response_model=TaxResponse, status_code=status.HTTP_201_CREATED) # <-- เปลี่ยนเป็น 201 Created
-def create_tax(tax: TaxCreate, db: Session = Depends(get_db)):
+async def create_tax(tax: TaxCreate, db=Depends(get_session)):
+    return await run_write(db, _insert_tax, tax)
+
+# งาน ORM แบบ sync ถูกเรียกผ่าน db.run_sync ได้ทั้งโหมด async และ sync
+def _insert_tax(db: Session, tax: TaxCreate):
     # ตรวจสอบว่า province มีอยู่แล้วหรือไม่ก่อนเพิ่ม (ทางเลือก, การจับ IntegrityError ก็เพียงพอ)
     existing_tax = db.query(Tax).filter(Tax.province == tax.province).first()
     if existing_tax:
@@ -35,8 +41,12 @@ def create_tax(tax: TaxCreate, db: Session = Depends(get_db)):
             description=tax.description
         )
         db.add(db_tax)
+        db.flush()
+        stats.record_insert(db, "taxes", db_tax)
+        versions = cache_sync.bump(db, "taxes")
         db.commit()
         db.refresh(db_tax)
+        tax_catalog.put(db_tax, versions)
         return db_tax
     except IntegrityError: # <-- จับข้อผิดพลาด UNIQUE constraint หากไม่ได้ตรวจเช็คไปก่อนหน้านี้
         db.rollback() # <--- สำคัญมาก: ต้อง rollback transaction หากเกิดข้อผิดพลาด
@@ -51,17 +61,98 @@ def create_tax(tax: TaxCreate, db: Session = Depends(get_db)):
             detail=f"An unexpected error occurred: {e}"
         )
 
+# นำเข้าหลายแถวในคำขอเดียว: body เป็น CSV (text/csv) หรือ NDJSON (application/x-ndjson)
+# atomic=true = commit ครั้งเดียวตอนจบ (ใช้ตอนโหลดข้อมูลใหม่ทั้งชุด) มีแถวผิดแม้แถวเดียวจะ rollback ทั้งหมด
+# upsert แก้อัตราของจังหวัดที่มีอยู่แล้วได้ จึงใช้ได้เฉพาะผู้ดูแล (ADMIN_USERNAMES)
+@router.post("/bulk", response_model=BulkImportReport)
+async def bulk_upsert_taxes(
+    request: Request,
+    atomic: bool = False,
+    chunk_size: int = Query(500, ge=1, le=10000),
+    current_user: CurrentUser = Depends(get_admin_user),
+    db=Depends(get_session),
+):
+    importer = BulkImporter(Tax, TaxCreate, detect_format(request.headers.get("content-type")), atomic, on_commit=tax_catalog.invalidate)
+    await import_stream(db, importer, request.stream(), chunk_size)
+    return importer.report()
+
+# คำนวณยอดลดหย่อนของหลายทริปในคำขอเดียว จากอัตราใน tax_catalog
+# ข้อมูลหลายจังหวัดในคำขอเดียว อ่านจาก catalog (ไม่มี query ถ้า catalog โหลดแล้ว)
+@router.post("/batch", response_model=TaxBatchResponse)
+async def get_taxes_batch(request: ProvinceBatchRequest, db=Depends(get_session)):
+    snapshot = await tax_catalog.snapshot_async(db)
+    return raw_json_response(snapshot.batch_json(request.provinces))
+
+@router.post("/calculate", response_model=TripCalculationResponse)
+async def calculate_trip_deductions(request: TripCalculationRequest, db=Depends(get_session)):
+    snapshot = await tax_catalog.snapshot_async(db)
+    return calculate_deductions(request.trips, snapshot)
+
+# แบ่งหน้าแบบ keyset ด้วย cursor=<id สุดท้ายของหน้าก่อน> ส่วน cursor หน้าถัดไปอยู่ใน header X-Next-Cursor
+# หมายเหตุ: คืนไม่เกิน limit แถว (ค่าเริ่มต้น 100) client ที่เคยได้ทั้งตารางต้องไล่ตาม X-Next-Cursor
+# หรือใช้ GET /tax/export แทน
+# fields=province,reduce_tax_percent คืนเฉพาะคอลัมน์ที่ขอ
 @router.get("/", response_model=list[TaxResponse])
-def get_all_taxes(db: Session = Depends(get_db)):
-    return db.query(Tax).all()
+async def get_all_taxes(
+    request: Request,
+    cursor: int | None = None,
+    limit: int = Query(100, ge=1, le=1000, description="Page size; follow X-Next-Cursor (or use /tax/export) for the whole table"),
+    fields: str | None = None,
+    is_secondary: int | None = None,
+    min_reduce_tax_percent: float | None = None,
+    max_reduce_tax_percent: float | None = None,
+    db=Depends(get_session),
+):
+    try:
+        columns = tax_catalog.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    snapshot = await tax_catalog.snapshot_async(db)
+    headers = await catalog_cache_headers(request, snapshot)
+    not_modified = not_modified_response(request, headers)
+    if not_modified:
+        return not_modified
+
+    rows, next_cursor = await snapshot.page_async(
+        after_id=cursor,
+        limit=limit,
+        is_secondary=is_secondary,
+        ranges={"reduce_tax_percent": (min_reduce_tax_percent, max_reduce_tax_percent)},
+    )
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    if columns:
+        return FastJSONResponse([{key: row[key] for key in columns} for row in rows], headers=headers)
+    return raw_json_response(snapshot.rows_json(rows), headers)
+
+# ส่งออกทั้งตารางแบบ stream (ต้องประกาศก่อน /{province})
+@router.get("/export")
+async def export_taxes(
+    request: Request,
+    fmt: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    db=Depends(get_stream_session),
+):
+    return export_response(request, db, Tax, fmt, chunk_size)
 
 @router.get("/secondary/", response_model=list[TaxResponse])
-def get_secondary_taxes(db: Session = Depends(get_db)):
-    return db.query(Tax).filter(Tax.is_secondary == 1).all()
+async def get_secondary_taxes(request: Request, db=Depends(get_session)):
+    snapshot = await tax_catalog.snapshot_async(db)
+    headers = await catalog_cache_headers(request, snapshot)
+    not_modified = not_modified_response(request, headers)
+    if not_modified:
+        return not_modified
+    return raw_json_response(snapshot.rows_json(snapshot.secondary), headers)
 
 @router.get("/{province}", response_model=TaxResponse)
-def get_tax_by_province(province: str, db: Session = Depends(get_db)):
-    tax = db.query(Tax).filter(Tax.province == province).first()
+async def get_tax_by_province(province: str, request: Request, db=Depends(get_session)):
+    snapshot = await tax_catalog.snapshot_async(db)
+    tax = snapshot.by_province.get(province)
     if not tax:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tax info not found") # <-- ใช้ status.HTTP_404_NOT_FOUND
-    return tax
\ No newline at end of file
+    headers = await catalog_cache_headers(request, snapshot)
+    not_modified = not_modified_response(request, headers)
+    if not_modified:
+        return not_modified
+    return raw_json_response(snapshot.row_json(tax), headers)
\ No newline at end of file
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, Response, status
+
+from app.auth.token__service import revoke_refresh_token, rotate_refresh_token
+from app.database import get_session, run_write
+from app.schemas import RefreshRequest, Token
+
+router = APIRouter(prefix="/token", tags=["Token"])
+
+# แลก refresh token เป็น access + refresh token คู่ใหม่ (ใบเดิมใช้ไม่ได้อีก) ไม่ผ่าน bcrypt
+@router.post("/refresh", response_model=Token)
+async def refresh_token(body: RefreshRequest, db=Depends(get_session)):
+    return await run_write(db, rotate_refresh_token, body.refresh_token)
+
+# logout: เพิกถอน refresh token นี้ทั้ง family รวมถึง access token ที่ออกคู่กัน
+@router.post("/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_token(body: RefreshRequest, db=Depends(get_session)):
+    await run_write(db, revoke_refresh_token, body.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,20 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from app.schemas.travel_schemas import TravelCreate, TravelResponse
+from app.schemas.province_schemas import ProvinceBatchRequest
+from app.schemas.travel_schemas import TravelCreate, TravelResponse, TravelBatchResponse
+from app.schemas.bulk_schemas import BulkImportReport
+from app.fast_json import FastJSONResponse, raw_json_response
+from app.http_cache import catalog_cache_headers, not_modified_response
+from app.bulk import BulkImporter, detect_format, import_stream
+from app.export import export_response
 from app.models.travel_model import Travel
-from app.database import SessionLocal
+from app.catalog import travel_catalog
+from app import cache_sync, stats
+from app.auth import CurrentUser, get_admin_user
+from app.database import get_session, get_stream_session, run_write
 
 router = APIRouter(prefix="/travel", tags=["Travel"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/", response_model=TravelResponse)
-def create_travel(travel: TravelCreate, db: Session = Depends(get_db)):
+async def create_travel(travel: TravelCreate, db=Depends(get_session)):
+    return await run_write(db, _insert_travel, travel)
+
+def _insert_travel(db: Session, travel: TravelCreate):
     db_travel = Travel(
         province=travel.province,
         description=travel.description,
@@ -22,21 +29,95 @@ def create_travel(travel: TravelCreate, db: Session = Depends(get_db)):
         is_secondary=travel.is_secondary
     )
     db.add(db_travel)
+    db.flush()
+    stats.record_insert(db, "travels", db_travel)
+    versions = cache_sync.bump(db, "travels")
     db.commit()
     db.refresh(db_travel)
+    travel_catalog.put(db_travel, versions)
     return db_travel
 
+# เหมือน POST /tax/bulk
+@router.post("/bulk", response_model=BulkImportReport)
+async def bulk_upsert_travels(
+    request: Request,
+    atomic: bool = False,
+    chunk_size: int = Query(500, ge=1, le=10000),
+    current_user: CurrentUser = Depends(get_admin_user),
+    db=Depends(get_session),
+):
+    importer = BulkImporter(Travel, TravelCreate, detect_format(request.headers.get("content-type")), atomic, on_commit=travel_catalog.invalidate)
+    await import_stream(db, importer, request.stream(), chunk_size)
+    return importer.report()
+
+# เหมือน POST /tax/batch
+@router.post("/batch", response_model=TravelBatchResponse)
+async def get_travels_batch(request: ProvinceBatchRequest, db=Depends(get_session)):
+    snapshot = await travel_catalog.snapshot_async(db)
+    return raw_json_response(snapshot.batch_json(request.provinces))
+
+# พารามิเตอร์เหมือน GET /tax/ (cursor, limit, fields, is_secondary) กรองช่วงด้วย tax_reduction
 @router.get("/", response_model=list[TravelResponse])
-def get_all_travels(db: Session = Depends(get_db)):
-    return db.query(Travel).all()
+async def get_all_travels(
+    request: Request,
+    cursor: int | None = None,
+    limit: int = Query(100, ge=1, le=1000, description="Page size; follow X-Next-Cursor (or use /travel/export) for the whole table"),
+    fields: str | None = None,
+    is_secondary: int | None = None,
+    min_tax_reduction: float | None = None,
+    max_tax_reduction: float | None = None,
+    db=Depends(get_session),
+):
+    try:
+        columns = travel_catalog.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    snapshot = await travel_catalog.snapshot_async(db)
+    headers = await catalog_cache_headers(request, snapshot)
+    not_modified = not_modified_response(request, headers)
+    if not_modified:
+        return not_modified
+
+    rows, next_cursor = await snapshot.page_async(
+        after_id=cursor,
+        limit=limit,
+        is_secondary=is_secondary,
+        ranges={"tax_reduction": (min_tax_reduction, max_tax_reduction)},
+    )
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+    if columns:
+        return FastJSONResponse([{key: row[key] for key in columns} for row in rows], headers=headers)
+    return raw_json_response(snapshot.rows_json(rows), headers)
+
+# ส่งออกทั้งตารางแบบ stream (ต้องประกาศก่อน /{province})
+@router.get("/export")
+async def export_travels(
+    request: Request,
+    fmt: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    db=Depends(get_stream_session),
+):
+    return export_response(request, db, Travel, fmt, chunk_size)
 
 @router.get("/secondary/", response_model=list[TravelResponse])
-def get_secondary_provinces(db: Session = Depends(get_db)):
-    return db.query(Travel).filter(Travel.is_secondary == 1).all()
+async def get_secondary_provinces(request: Request, db=Depends(get_session)):
+    snapshot = await travel_catalog.snapshot_async(db)
+    headers = await catalog_cache_headers(request, snapshot)
+    not_modified = not_modified_response(request, headers)
+    if not_modified:
+        return not_modified
+    return raw_json_response(snapshot.rows_json(snapshot.secondary), headers)
 
 @router.get("/{province}", response_model=TravelResponse)
-def get_travel_by_province(province: str, db: Session = Depends(get_db)):
-    travel = db.query(Travel).filter(Travel.province == province).first()
+async def get_travel_by_province(province: str, request: Request, db=Depends(get_session)):
+    snapshot = await travel_catalog.snapshot_async(db)
+    travel = snapshot.by_province.get(province)
     if not travel:
         raise HTTPException(status_code=404, detail="Travel info not found")
-    return travel
\ No newline at end of file
+    headers = await catalog_cache_headers(request, snapshot)
+    not_modified = not_modified_response(request, headers)
+    if not_modified:
+        return not_modified
+    return raw_json_response(snapshot.row_json(travel), headers)
\ No newline at end of file
@@ -1,4 +1,8 @@
 from .user_schemas import UserCreate, UserResponse
-from .token__schemas import UserLogin, Token, TokenData
-from .travel_schemas import TravelCreate, TravelResponse
-from .tax_schemas import TaxCreate, TaxResponse
\ No newline at end of file
+from .token__schemas import UserLogin, Token, TokenData, RefreshRequest
+from .travel_schemas import TravelCreate, TravelResponse, TravelBatchResponse
+from .tax_schemas import TaxCreate, TaxResponse, TaxBatchResponse, TripInput, TripCalculationRequest, TripDeduction, TripCalculationResponse
+from .bulk_schemas import BulkRowError, BulkImportReport, BulkUserReport
+from .search_schemas import ProvinceMatch
+from .province_schemas import ProvinceDetail, ProvinceBatchRequest, ProvinceDetailBatch
+from .stats_schemas import StatsResponse, ReconcileResponse
\ No newline at end of file
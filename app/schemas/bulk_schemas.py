@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+
+class BulkRowError(BaseModel):
+    row: int      # ลำดับแถวข้อมูล (เริ่มที่ 1 ไม่นับ header ของ CSV)
+    error: str
+
+class BulkImportReport(BaseModel):
+    processed: int
+    upserted: int
+    committed: bool
+    errors: list[BulkRowError] = []
+
+class BulkUserReport(BaseModel):
+    processed: int
+    created: int
+    errors: list[BulkRowError] = []
@@ -0,0 +1,21 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from .tax_schemas import TaxResponse
+from .travel_schemas import TravelResponse
+
+class ProvinceDetail(BaseModel):
+    province: str
+    effective_tax_percent: float | None                     # กติกาลดหย่อนที่ใช้จริง
+    is_secondary: int | None
+    tax_rule_source: Literal["tax", "travel"] | None       # ตารางที่ effective_tax_percent มาจาก
+    travel: TravelResponse | None
+    tax: TaxResponse | None
+
+class ProvinceBatchRequest(BaseModel):
+    provinces: list[str] = Field(min_length=1, max_length=100)
+
+class ProvinceDetailBatch(BaseModel):
+    results: dict[str, ProvinceDetail | None]   # None = ไม่พบจังหวัดนี้
+    not_found: list[str]
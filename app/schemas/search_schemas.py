@@ -0,0 +1,8 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+class ProvinceMatch(BaseModel):
+    province: str                               # ชื่อตามที่เก็บในตาราง
+    score: float                                # 1.0 = ตรงทุกตัวอักษร (หลัง normalize)
+    sources: list[Literal["tax", "travel"]]     # ตารางที่มีจังหวัดนี้
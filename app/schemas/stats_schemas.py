@@ -0,0 +1,31 @@
+from datetime import date
+
+from pydantic import BaseModel
+
+class RateSummary(BaseModel):
+    count: int              # จำนวนแถวที่มีอัตราลดหย่อน
+    min: float | None
+    avg: float | None
+    max: float | None
+
+class TableStats(BaseModel):
+    total: int
+    secondary: int          # is_secondary = 1
+    main: int
+    rate: RateSummary
+
+class DailyCount(BaseModel):
+    day: date
+    count: int
+
+class UserStats(BaseModel):
+    total: int
+    registrations_per_day: list[DailyCount]   # เฉพาะวันที่มีผู้สมัคร เรียงตามวัน
+
+class StatsResponse(BaseModel):
+    taxes: TableStats
+    travels: TableStats
+    users: UserStats
+
+class ReconcileResponse(BaseModel):
+    reconciled: list[str]   # ตัวนับที่ค่าไม่ตรงกับตาราง (ถูกแก้แล้ว)
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from datetime import date
+
+from pydantic import BaseModel, Field
 
 class TaxBase(BaseModel):
     province: str
@@ -13,4 +15,32 @@ class TaxResponse(TaxBase):
     id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class TaxBatchResponse(BaseModel):
+    results: dict[str, TaxResponse | None]   # None = ไม่พบจังหวัดนี้
+    not_found: list[str]
+
+class TripInput(BaseModel):
+    province: str
+    spend: float = Field(ge=0)
+    start_date: date | None = None
+    end_date: date | None = None
+
+class TripCalculationRequest(BaseModel):
+    trips: list[TripInput] = Field(max_length=100000)
+
+class TripDeduction(BaseModel):
+    province: str
+    spend: float
+    reduce_tax_percent: float | None   # None = ไม่พบจังหวัด
+    is_secondary: int | None
+    deduction: float
+    eligible: bool
+    reason: str | None = None
+
+class TripCalculationResponse(BaseModel):
+    trips: list[TripDeduction]
+    total_main: float
+    total_secondary: float
+    total: float
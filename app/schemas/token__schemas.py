@@ -5,6 +5,12 @@ from typing import Optional
 class Token(BaseModel):
     access_token: str
     token_type: str
+    expires_in: Optional[int] = None        # อายุ access token (วินาที)
+    refresh_token: Optional[str] = None     # ใช้ครั้งเดียวที่ POST /token/refresh
+
+# แลก refresh token เป็นคู่ใหม่ หรือเพิกถอน (logout)
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 # สำหรับใช้ validate token ที่ถอดรหัสแล้ว
 class TokenData(BaseModel):
@@ -13,4 +13,8 @@ class TravelResponse(TravelBase):
     id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class TravelBatchResponse(BaseModel):
+    results: dict[str, TravelResponse | None]   # None = ไม่พบจังหวัดนี้
+    not_found: list[str]
\ No newline at end of file
@@ -0,0 +1,186 @@
+"""ค้นหาชื่อจังหวัดจากตาราง taxes/travels ด้วย index ในหน่วยความจำ
+
+ชื่อทุกชื่อถูก normalize ก่อน (ตัวพิมพ์เล็ก ตัดช่องว่าง/เครื่องหมาย และตัดวรรณยุกต์ไทย)
+แล้วเก็บเป็นคีย์ใน
+- รายการคีย์ที่เรียงไว้ สำหรับค้นแบบขึ้นต้นด้วย (bisect)
+- inverted index ของ trigram สำหรับค้นชื่อที่สะกดต่างไปเล็กน้อย
+
+จังหวัดที่อยู่ใน PROVINCE_ALIASES จะมีคีย์ของชื่อไทยและชื่ออักษรโรมันทุกแบบ
+ค้น "chiangmai" จึงเจอ "เชียงใหม่" ได้
+
+index สร้างจาก catalog snapshot ครั้งแรกที่ถูกค้น หลังจากนั้นเพิ่มทีละชื่อเมื่อ catalog.put()
+และสร้างใหม่เมื่อ catalog ถูก invalidate (เช่นหลัง bulk import)
+"""
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left
+
+from app.catalog import tax_catalog, travel_catalog
+from app.province_names import PROVINCE_ALIASES
+
+SOURCES = {"tax": tax_catalog, "travel": travel_catalog}
+
+# ไม้ไต่คู้ ไม้เอก-ไม้จัตวา และการันต์ ผู้ใช้มักพิมพ์ตกหล่น
+_THAI_MARKS = {chr(code) for code in range(0x0E47, 0x0E4D)}
+MIN_SIMILARITY = 0.35
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+FUZZY_WEIGHT = 0.7
+# trigram ที่มีในคีย์มากกว่านี้ (เช่น "pro" ของ province-1..N) ไม่ใช้หา candidate
+MAX_POSTINGS = 500
+# โหลด snapshot ใหม่ได้กี่ครั้งถ้ามีการเขียนแทรกระหว่างสร้าง index
+MAX_BUILD_ATTEMPTS = 5
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return "".join(
+        ch for ch in text
+        if ch not in _THAI_MARKS and (ch.isalnum() or "\u0e00" <= ch <= "\u0e7f")
+    )
+
+
+def trigrams(key: str) -> set:
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# คีย์ของชื่อหนึ่ง -> คีย์ของทุกชื่อในกลุ่มเดียวกัน
+_ALIAS_KEYS = {}
+for _names in PROVINCE_ALIASES:
+    _keys = frozenset(normalize(name) for name in _names)
+    for _key in _keys:
+        _ALIAS_KEYS[_key] = _keys
+
+
+class ProvinceNames:
+    """ชื่อจังหวัดพร้อม index สำหรับค้นหา (ไม่มี lock ผู้เรียกต้องกันการแก้ไขพร้อมกันเอง)"""
+
+    def __init__(self):
+        self.entries = {}       # ชื่อจังหวัดตามที่เก็บในฐานข้อมูล -> set ของ source
+        self.keys = {}          # คีย์ -> set ของชื่อ
+        self.sorted_keys = []
+        self.grams = {}         # trigram -> set ของคีย์
+        self.key_grams = {}     # คีย์ -> set ของ trigram
+
+    @classmethod
+    def from_snapshots(cls, snapshots) -> "ProvinceNames":
+        names = cls()
+        for source, snapshot in snapshots.items():
+            for row in snapshot.rows:
+                names.add(row["province"], source)
+        return names
+
+    def add(self, province: str, source: str) -> None:
+        self.entries.setdefault(province, set()).add(source)
+        key = normalize(province)
+        for alias in _ALIAS_KEYS.get(key, (key,)):
+            if not alias:
+                continue
+            names = self.keys.get(alias)
+            if names is None:
+                names = self.keys[alias] = set()
+                self.sorted_keys.insert(bisect_left(self.sorted_keys, alias), alias)
+                grams = self.key_grams[alias] = trigrams(alias)
+                for gram in grams:
+                    self.grams.setdefault(gram, set()).add(alias)
+            names.add(province)
+
+    def _matching(self, scores, source) -> list:
+        return [name for name in scores if source is None or source in self.entries[name]]
+
+    def search(self, query: str, limit: int = 10, source: str | None = None) -> list:
+        q = normalize(query)
+        if not q:
+            return []
+        scores = {}
+
+        def offer(key, score):
+            for name in self.keys[key]:
+                if score > scores.get(name, 0.0):
+                    scores[name] = score
+
+        if q in self.keys:
+            offer(q, EXACT_SCORE)
+
+        index = bisect_left(self.sorted_keys, q)
+        while index < len(self.sorted_keys) and self.sorted_keys[index].startswith(q):
+            key = self.sorted_keys[index]
+            offer(key, PREFIX_SCORE + (EXACT_SCORE - PREFIX_SCORE) * len(q) / len(key))
+            index += 1
+
+        # คะแนน fuzzy สูงสุดคือ FUZZY_WEIGHT < PREFIX_SCORE ถ้าได้ครบ limit แล้วจึงไม่ต้องค้นต่อ
+        if len(self._matching(scores, source)) < limit:
+            query_grams = trigrams(q)
+            candidates = set()
+            for gram in query_grams:
+                postings = self.grams.get(gram, ())
+                if len(postings) <= MAX_POSTINGS:
+                    candidates.update(postings)
+            for key in candidates:
+                grams = self.key_grams[key]
+                similarity = 2 * len(query_grams & grams) / (len(query_grams) + len(grams))  # Dice coefficient
+                if similarity >= MIN_SIMILARITY:
+                    offer(key, FUZZY_WEIGHT * similarity)
+
+        top = heapq.nsmallest(limit, self._matching(scores, source), key=lambda name: (-scores[name], name))
+        return [
+            {"province": name, "score": round(scores[name], 3), "sources": sorted(self.entries[name])}
+            for name in top
+        ]
+
+
+class ProvinceSearchIndex:
+    def __init__(self, sources=SOURCES):
+        self.sources = sources
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._built = False
+        self._names = ProvinceNames()
+        for source, catalog in sources.items():
+            catalog.subscribe(lambda row, source=source: self._on_change(source, row))
+
+    def _on_change(self, source: str, row) -> None:
+        with self._lock:
+            # นับทุกการเปลี่ยน (รวม put) index ที่กำลังสร้างจาก snapshot เก่าจะไม่ถูกติดตั้ง
+            self._generation += 1
+            if row is None:
+                self._built = False
+                self._names = ProvinceNames()
+            elif self._built:
+                self._names.add(row["province"], source)
+
+    async def ensure(self, db) -> ProvinceNames:
+        """สร้าง index จาก catalog ถ้ายังไม่มี คืน index ที่ใช้ค้นได้
+
+        ถ้ามีการเขียนแทรกทุกครั้งจนครบ MAX_BUILD_ATTEMPTS คืน index จาก snapshot ชุดล่าสุดโดยไม่ติดตั้ง
+        (เหมือน province_view) ครั้งถัดไปจึงสร้างใหม่อีกครั้ง
+        """
+        for _ in range(MAX_BUILD_ATTEMPTS):
+            if self._built:
+                return self._names
+            generation = self._generation
+            snapshots = {source: await catalog.snapshot_async(db) for source, catalog in self.sources.items()}
+            names = ProvinceNames.from_snapshots(snapshots)
+            with self._lock:
+                # ติดตั้งเฉพาะเมื่อไม่มี put/invalidate ระหว่างโหลด ไม่เช่นนั้นสร้างใหม่จาก snapshot ล่าสุด
+                if not self._built and generation == self._generation:
+                    self._names = names
+                    self._built = True
+                    return names
+        return names
+
+    def search(self, query: str, limit: int = 10, source: str | None = None, names: ProvinceNames | None = None) -> list:
+        """คืน [{province, score, sources}] เรียงจากคะแนนมากไปน้อย
+
+        names คือค่าที่ ensure() คืน (ไม่ระบุ = index ที่ติดตั้งอยู่)
+        """
+        with self._lock:
+            if names is None or names is self._names:
+                return self._names.search(query, limit, source)
+        # index ชั่วคราวไม่มีใครแก้ไข ค้นได้โดยไม่ถือ lock
+        return names.search(query, limit, source)
+
+
+search_index = ProvinceSearchIndex()
@@ -0,0 +1,91 @@
+"""จับเวลา startup และ prewarm ของ worker
+
+import app.main ทำแค่สร้าง FastAPI และ router ส่วนงานที่ช้า (engine, schema, pool,
+catalog, search index, passlib/bcrypt และ jose) เลื่อนไปทำตอนใช้ครั้งแรก
+prewarm() ทำงานเหล่านั้นใน lifespan ก่อนรับ request แรก (ปิดได้ด้วย PREWARM_ON_STARTUP=0)
+
+เวลาแต่ละช่วงอยู่ใน metric app_startup_seconds{phase} และ log ของ app.startup
+"""
+import logging
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from app import STARTED_AT
+from app.metrics import Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+STARTUP_SECONDS = registry.register(Gauge("app_startup_seconds", "Worker startup time by phase.", ("phase",)))
+
+
+def record(phase: str, seconds: float) -> None:
+    STARTUP_SECONDS.set(phase, value=seconds)
+    logger.info("startup %s: %.1f ms", phase, seconds * 1000)
+
+
+def record_import() -> None:
+    """เวลาตั้งแต่ import แพ็กเกจ app จนสร้าง FastAPI เสร็จ"""
+    record("import", time.perf_counter() - STARTED_AT)
+
+
+class _phase:
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+
+
+def _warm_auth() -> None:
+    from jose import jwt  # noqa: F401
+
+    from app.auth.handler_auth import get_pwd_context
+
+    # โหลด backend ของ bcrypt (ตรวจ bug ของ backend ด้วยการ hash ทดสอบ) ไว้ก่อน login แรก
+    get_pwd_context().handler("bcrypt").get_backend()
+
+
+def uses_app_database(app) -> bool:
+    """False ถ้า test override session ไว้ (งานเบื้องหลังไม่ควรแตะฐานข้อมูลจริง)"""
+    from app.database import get_session
+
+    return get_session not in app.dependency_overrides
+
+
+async def _warm_database() -> None:
+    from app import cache_sync
+    from app.catalog import tax_catalog, travel_catalog
+    from app.config import DB_MODE
+    from app.database import get_async_engine, get_engine, get_stream_session
+    from app.province_view import province_view
+    from app.search import search_index
+
+    with _phase("database"):
+        # สร้าง engine และ schema (ถ้ายังไม่มี)
+        await run_in_threadpool(get_engine)
+        if DB_MODE == "async":
+            get_async_engine()
+    with _phase("catalogs"):
+        db = get_stream_session()
+        try:
+            # จำเลข version ก่อนโหลด การเขียนหลังจากนี้จะถูกเห็นในรอบ poll ถัดไป
+            await cache_sync.check(db)
+            for catalog in (tax_catalog, travel_catalog):
+                await catalog.snapshot_async(db)
+            await province_view.details(db)
+            await search_index.ensure(db)
+        finally:
+            await db.close()
+
+
+async def prewarm(app) -> None:
+    with _phase("prewarm"):
+        if uses_app_database(app):
+            await _warm_database()
+        with _phase("auth"):
+            await run_in_threadpool(_warm_auth)
+    record("ready", time.perf_counter() - STARTED_AT)
@@ -0,0 +1,182 @@
+"""สถิติรวมของ taxes, travels และ users สำหรับ GET /stats
+
+ตัวนับอยู่ในตาราง stat_counters และถูกอัปเดตทีละแถวโดย handler ที่ insert
+ใน transaction เดียวกัน (commit หรือ rollback ไปพร้อมกัน) /stats จึงอ่านแค่ไม่กี่แถว
+แทนการ scan ทั้งตาราง
+
+- การ upsert หลายแถว (/bulk, app.cli) อาจแก้แถวเดิม ซึ่งทำให้ min/max คำนวณต่อไม่ได้
+  จึงลบตัวนับของตารางนั้นทิ้ง แล้วให้การอ่านครั้งถัดไปสร้างใหม่
+- reconcile() สร้างตัวนับใหม่จากตาราง (เรียกเมื่อตัวนับหายไป จาก
+  python -m app.cli reconcile-stats หรือทุก STATS_RECONCILE_INTERVAL_SECONDS)
+- จำนวนผู้สมัครรายวันมาจาก daily_registrations ที่บันทึกตอนสมัคร
+  (ตาราง users ไม่มีวันที่สมัคร reconcile จึงสร้างส่วนนี้ย้อนหลังไม่ได้)
+"""
+import asyncio
+import datetime as dt
+import logging
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.database import dialect_insert, get_stream_session, release_connection, run_write
+from app.models import DailyRegistration, StatCounter, Tax, Travel, User
+
+logger = logging.getLogger(__name__)
+
+# ชื่อตัวนับ -> (model, คอลัมน์อัตราลดหย่อน, คอลัมน์จังหวัดรอง)
+TRACKED = {
+    "taxes": (Tax, Tax.reduce_tax_percent, Tax.is_secondary),
+    "travels": (Travel, Travel.tax_reduction, Travel.is_secondary),
+    "users": (User, None, None),
+}
+FIELDS = ("total", "secondary", "rate_count", "rate_sum", "rate_min", "rate_max")
+
+
+def _increment(rate, is_secondary) -> dict:
+    values = {"total": StatCounter.total + 1}
+    if is_secondary:
+        values["secondary"] = StatCounter.secondary + 1
+    if rate is not None:
+        values.update(
+            rate_count=StatCounter.rate_count + 1,
+            rate_sum=StatCounter.rate_sum + rate,
+            rate_min=case((StatCounter.rate_min.is_(None) | (StatCounter.rate_min > rate), rate), else_=StatCounter.rate_min),
+            rate_max=case((StatCounter.rate_max.is_(None) | (StatCounter.rate_max < rate), rate), else_=StatCounter.rate_max),
+        )
+    return values
+
+
+def record_insert(db: Session, name: str, obj) -> None:
+    """นับแถวใหม่หนึ่งแถว เรียกก่อน db.commit() ของการ insert นั้น
+
+    ถ้ายังไม่มีตัวนับ (ยังไม่เคย reconcile) จะไม่ทำอะไร การอ่านครั้งถัดไปจะนับจากตารางเอง
+    """
+    _, rate_column, secondary_column = TRACKED[name]
+    rate = getattr(obj, rate_column.key) if rate_column is not None else None
+    # นับแบบเดียวกับ count_table (is_secondary == 1) ไม่เช่นนั้น reconcile จะเห็นว่าคลาดเคลื่อน
+    is_secondary = secondary_column is not None and getattr(obj, secondary_column.key) == 1
+    db.execute(update(StatCounter).where(StatCounter.name == name).values(**_increment(rate, is_secondary)))
+
+
+def record_registration(db: Session, user, today: dt.date | None = None) -> None:
+    """นับผู้ใช้ใหม่ (รวมและรายวัน) เรียกก่อน db.commit() ของการสมัคร"""
+    record_registrations(db, 1, today)
+
+
+def record_registrations(db: Session, count: int, today: dt.date | None = None) -> None:
+    """นับผู้ใช้ใหม่ count คนในคำสั่งเดียว (ใช้กับการสมัครทีละมากๆ)"""
+    if count <= 0:
+        return
+    db.execute(update(StatCounter).where(StatCounter.name == "users").values(total=StatCounter.total + count))
+    day = today or dt.datetime.now(dt.timezone.utc).date()
+    stmt = dialect_insert(db)(DailyRegistration).values(day=day, count=count)
+    db.execute(stmt.on_conflict_do_update(index_elements=["day"], set_={"count": DailyRegistration.count + count}))
+
+
+def drop_counter(db: Session, name: str) -> None:
+    """ลบตัวนับใน transaction ปัจจุบัน (ใช้หลัง upsert ที่นับทีละแถวไม่ได้)"""
+    db.execute(delete(StatCounter).where(StatCounter.name == name))
+
+
+def count_table(db: Session, name: str) -> dict:
+    model, rate_column, secondary_column = TRACKED[name]
+    if rate_column is None:
+        total = db.execute(select(func.count()).select_from(model)).scalar_one()
+        return {"total": total, "secondary": 0, "rate_count": 0, "rate_sum": 0.0, "rate_min": None, "rate_max": None}
+    row = db.execute(select(
+        func.count(),
+        func.coalesce(func.sum(case((secondary_column == 1, 1), else_=0)), 0),
+        func.count(rate_column),
+        func.coalesce(func.sum(rate_column), 0.0),
+        func.min(rate_column),
+        func.max(rate_column),
+    ).select_from(model)).one()
+    return dict(zip(FIELDS, row))
+
+
+def _same(old, new) -> bool:
+    # rate_sum เป็นผลบวกของ float ลำดับการบวกต่างกันได้ผลต่างเล็กน้อย ไม่นับว่าคลาดเคลื่อน
+    if old is None or new is None:
+        return old is new
+    return round(old, 6) == round(new, 6)
+
+
+def reconcile(db: Session, names=None) -> list:
+    """สร้างตัวนับใหม่จากตาราง คืนชื่อตัวนับที่ค่าเดิมไม่ตรง (หรือไม่มี)"""
+    names = list(names or TRACKED)
+    current = {counter.name: counter for counter in db.query(StatCounter).filter(StatCounter.name.in_(names))}
+    drifted = []
+    for name in names:
+        values = count_table(db, name)
+        counter = current.get(name)
+        if counter is None:
+            db.add(StatCounter(name=name, **values))
+            drifted.append(name)
+            continue
+        if any(not _same(getattr(counter, field), value) for field, value in values.items()):
+            drifted.append(name)
+        for field, value in values.items():
+            setattr(counter, field, value)
+    db.commit()
+    if drifted:
+        logger.info("stats reconciled: %s", ", ".join(drifted))
+    return drifted
+
+
+def _summary(counter: dict) -> dict:
+    return {
+        "total": counter["total"],
+        "secondary": counter["secondary"],
+        "main": counter["total"] - counter["secondary"],
+        "rate": {
+            "count": counter["rate_count"],
+            "min": counter["rate_min"],
+            "avg": counter["rate_sum"] / counter["rate_count"] if counter["rate_count"] else None,
+            "max": counter["rate_max"],
+        },
+    }
+
+
+def read_counters(db: Session) -> dict:
+    counters = {
+        counter.name: {field: getattr(counter, field) for field in FIELDS}
+        for counter in db.query(StatCounter)
+    }
+    # คืน connection ก่อนที่ get_stats อาจต้องรอ write lock เพื่อ reconcile
+    release_connection(db)
+    return counters
+
+
+def read_registrations(db: Session, days: int) -> list:
+    since = dt.datetime.now(dt.timezone.utc).date() - dt.timedelta(days=days - 1)
+    rows = db.query(DailyRegistration).filter(DailyRegistration.day >= since).order_by(DailyRegistration.day)
+    return [{"day": row.day, "count": row.count} for row in rows]
+
+
+async def get_stats(db, days: int = 30) -> dict:
+    """สถิติทั้งหมด (reconcile เฉพาะตัวนับที่ยังไม่มีก่อน)"""
+    counters = await db.run_sync(read_counters)
+    missing = [name for name in TRACKED if name not in counters]
+    if missing:
+        await run_write(db, reconcile, missing)
+        counters = await db.run_sync(read_counters)
+    registrations = await db.run_sync(read_registrations, days)
+    users = counters["users"]
+    return {
+        "taxes": _summary(counters["taxes"]),
+        "travels": _summary(counters["travels"]),
+        "users": {"total": users["total"], "registrations_per_day": registrations},
+    }
+
+
+async def reconcile_forever(interval: float) -> None:
+    """งานเบื้องหลังที่ reconcile ทุก interval วินาที (ยกเลิกด้วย task.cancel())"""
+    while True:
+        await asyncio.sleep(interval)
+        db = get_stream_session()
+        try:
+            await run_write(db, reconcile)
+        except Exception:
+            logger.exception("stats reconciliation failed")
+        finally:
+            await db.close()
@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import metrics, profiling
+from app.main import app
+from app.auth import CurrentUser, get_admin_user
+from app.database import Base, get_db, get_session, get_stream_session, SyncSessionRunner
+from app.catalog import tax_catalog, travel_catalog
+
+# ฐานข้อมูลทดสอบร่วมของทุกไฟล์ใน app/tests
+# StaticPool: ให้ทุก thread ใช้ connection เดียวกัน (in-memory DB แยกตาม connection)
+test_engine = create_engine(
+    "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+# listener ทั้งสองทำงานเฉพาะใน request ที่วัด/profile อยู่ ไฟล์อื่นจึงไม่ได้รับผล
+metrics.instrument_engine(test_engine)
+profiling.instrument_engine(test_engine)
+TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+
+def _invalidate_catalogs() -> None:
+    # catalog อยู่ระดับ module ต้องล้างไม่ให้ข้อมูลของ test ก่อนหน้าค้าง
+    tax_catalog.invalidate()
+    travel_catalog.invalidate()
+
+
+@pytest.fixture(name="engine")
+def engine_fixture():
+    return test_engine
+
+
+@pytest.fixture(name="session_factory")
+def session_factory_fixture():
+    """ใช้แทน app.database.SessionLocal (เช่นใน app.cli)"""
+    return TestSessionLocal
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    """session ของฐานข้อมูลที่สร้างตารางใหม่ทุก test"""
+    Base.metadata.drop_all(test_engine)
+    Base.metadata.create_all(test_engine)
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(name="client")
+def client_fixture(session):
+    """TestClient ที่ทุก dependency ของ session ใช้ session ทดสอบ"""
+    def override_get_db():
+        yield session
+
+    def override_get_session():
+        yield SyncSessionRunner(session)
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_stream_session] = lambda: SyncSessionRunner(session)
+    _invalidate_catalogs()
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+    _invalidate_catalogs()
+
+
+@pytest.fixture(name="admin")
+def admin_fixture():
+    """endpoint ของผู้ดูแลใช้ผู้ใช้ทดสอบ (test ที่ตรวจสิทธิ์จริงลบ override นี้เอง)"""
+    app.dependency_overrides[get_admin_user] = lambda: CurrentUser(id=0, username="admin", fullname="Admin", phone="0")
+    yield
+    app.dependency_overrides.pop(get_admin_user, None)
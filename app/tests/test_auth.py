@@ -1 +1,213 @@
+import asyncio
+import json
+import threading
 
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from passlib.hash import bcrypt
+
+from app.database import SyncSessionRunner
+from app.models import User
+from app.auth import handler_auth, token__auth, create_access_token, get_current_user, invalidate_user
+from app.auth.token__cache import token_cache
+from app.rate_limit import SQLiteBackend, login_limiter
+
+
+@pytest.fixture(autouse=True)
+def reset_login_limiter():
+    login_limiter.backend.clear()
+
+
+@pytest.fixture
+def user_data():
+    return {"username": "testuser", "password": "testpass", "fullname": "ทดสอบ ผู้ใช้", "phone": "0812345678"}
+
+
+def test_register_and_login(client: TestClient, user_data):
+    """สมัครสมาชิกแล้ว login ด้วยรหัสผ่านที่ถูกและผิด"""
+    assert client.get("/stats/").json()["users"] == {"total": 0, "registrations_per_day": []}
+    resp = client.post("/register/", json=user_data)
+    assert resp.status_code == 200
+    assert resp.json()["username"] == user_data["username"]
+    users = client.get("/stats/").json()["users"]
+    assert users["total"] == 1 and [day["count"] for day in users["registrations_per_day"]] == [1]
+
+    ok = client.post("/login/", data={"username": "testuser", "password": "testpass"})
+    assert ok.status_code == 200
+    assert ok.json()["token_type"] == "bearer"
+
+    bad = client.post("/login/", data={"username": "testuser", "password": "wrong"})
+    assert bad.status_code == 401
+
+
+def test_login_rehashes_deprecated_hash(client: TestClient, session, user_data):
+    """hash ที่ cost ไม่ตรงกับ BCRYPT_ROUNDS ต้องถูก rehash หลัง login สำเร็จ"""
+    old_hash = bcrypt.using(rounds=4).hash(user_data["password"])
+    session.add(User(username="olduser", hashed_password=old_hash, fullname="x", phone="0"))
+    session.commit()
+
+    resp = client.post("/login/", data={"username": "olduser", "password": user_data["password"]})
+    assert resp.status_code == 200
+
+    user = session.query(User).filter(User.username == "olduser").first()
+    assert user.hashed_password != old_hash
+    assert not handler_auth.pwd_context.needs_update(user.hashed_password)
+
+
+def test_register_sheds_load_when_pool_is_full(client: TestClient, user_data, monkeypatch):
+    """คิวของ password pool เต็ม -> ตอบ 503 แทนการรอ"""
+    monkeypatch.setattr(handler_auth, "PASSWORD_HASH_QUEUE_LIMIT", 0)
+    resp = client.post("/register/", json=user_data)
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+
+
+def test_get_current_user_uses_token_cache(session):
+    """token ที่ตรวจแล้วต้องไม่ query ฐานข้อมูลซ้ำจนกว่าจะถูก invalidate"""
+    token_cache.clear()
+    session.add(User(username="cached", hashed_password="x", fullname="Cached", phone="0"))
+    session.commit()
+    token = create_access_token({"sub": "cached"})
+
+    user = asyncio.run(get_current_user(token, SyncSessionRunner(session)))
+    assert user.username == "cached"
+
+    # cache hit: ไม่แตะ db เลย
+    assert asyncio.run(get_current_user(token, None)) == user
+
+    invalidate_user("cached")
+    assert token_cache.get(token) is None
+
+
+def test_login_lockout_skips_bcrypt(client: TestClient, user_data, monkeypatch):
+    """ผิดครบ threshold แล้วต้องได้ 429 ทันที แม้รหัสถูก และไม่เรียก bcrypt อีก"""
+    import importlib
+
+    login_module = importlib.import_module("app.routers.login_router")  # ไม่ใช่ router ที่ re-export ไว้
+
+    client.post("/register/", json=user_data)
+    for _ in range(5):
+        assert client.post("/login/", data={"username": "testuser", "password": "wrong"}).status_code == 401
+
+    calls = []
+    original = login_module.verify_password_async
+
+    async def counting_verify(*args):
+        calls.append(args)
+        return await original(*args)
+
+    monkeypatch.setattr(login_module, "verify_password_async", counting_verify)
+    resp = client.post("/login/", data={"username": "TestUser", "password": user_data["password"]})
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) == 30
+    assert calls == []
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    """สอง backend (เหมือนสอง worker) บนไฟล์เดียวกันต้องเห็น bucket และ lockout เดียวกัน"""
+    first, second = SQLiteBackend(str(tmp_path / "rl.db")), SQLiteBackend(str(tmp_path / "rl.db"))
+    assert first.take("ip:1.2.3.4", 2, 1.0, now=100.0) == 0
+    assert second.take("ip:1.2.3.4", 2, 1.0, now=100.0) == 0
+    assert first.take("ip:1.2.3.4", 2, 1.0, now=100.0) == 1.0
+    assert second.take("ip:1.2.3.4", 2, 1.0, now=101.0) == 0  # เติม 1 token ต่อวินาที
+
+    for _ in range(5):
+        locked_until = first.record_failure("bob", now=100.0)
+    assert locked_until == 130.0
+    assert second.locked_until("bob", now=100.0) == 130.0
+    assert second.record_failure("bob", now=131.0) == 131.0 + 60  # ผิดต่อ -> ล็อกนานขึ้นสองเท่า
+    second.reset("bob")
+    assert first.locked_until("bob", now=200.0) == 0.0
+
+
+def test_refresh_rotation_and_reuse_revokes_family(client: TestClient, session, user_data, monkeypatch):
+    """refresh ไม่ผ่าน bcrypt, ใบที่แลกแล้วใช้ซ้ำไม่ได้ และการใช้ซ้ำเพิกถอน access token ของทั้ง family"""
+    client.post("/register/", json=user_data)
+    first = client.post("/login/", data={"username": "testuser", "password": "testpass"}).json()
+    assert first["refresh_token"] and first["expires_in"] == 30 * 60
+
+    monkeypatch.setattr(handler_auth, "get_pwd_context", lambda: pytest.fail("refresh must not use bcrypt"))
+    second = client.post("/token/refresh", json={"refresh_token": first["refresh_token"]}).json()
+    assert second["refresh_token"] != first["refresh_token"]
+    user = asyncio.run(get_current_user(second["access_token"], SyncSessionRunner(session)))
+    assert user.username == "testuser"
+
+    # refresh token ใช้แทน access token ไม่ได้
+    with pytest.raises(HTTPException):
+        asyncio.run(get_current_user(second["refresh_token"], SyncSessionRunner(session)))
+
+    reused = client.post("/token/refresh", json={"refresh_token": first["refresh_token"]})
+    assert reused.status_code == 401
+    # access token ที่อยู่ใน token_cache แล้วก็ถูกปฏิเสธ
+    with pytest.raises(HTTPException):
+        asyncio.run(get_current_user(second["access_token"], SyncSessionRunner(session)))
+    assert client.post("/token/refresh", json={"refresh_token": second["refresh_token"]}).status_code == 401
+
+
+def _post_with_timeout(client: TestClient, url: str, timeout: float = 30, **kwargs):
+    """client.post ใน thread แยก ถ้า endpoint ค้าง test จะ fail แทนที่จะค้างทั้ง suite"""
+    result = {}
+
+    def post():
+        try:
+            result["response"] = client.post(url, **kwargs)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=post, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        pytest.fail(f"POST {url} did not finish within {timeout}s")
+    if "error" in result:
+        raise result["error"]
+    return result["response"]
+
+
+def test_bulk_register_users(client: TestClient, session, user_data, tmp_path, monkeypatch):
+    """สมัครหลายคนในคำขอเดียว: ตัดชื่อซ้ำในไฟล์และในฐานข้อมูล รายงานความคืบหน้าและ error ต่อแถว"""
+    from app import cli
+
+    client.post("/register/", json=user_data)
+    token = client.post("/login/", data={"username": "testuser", "password": "testpass"}).json()["access_token"]
+    csv_body = (
+        "username,password,fullname,phone\n"
+        "p1,pw1,One,01\n"
+        "testuser,pw,Dup,02\n"
+        "p2,pw2,Two,03\n"
+        "p1,pw3,Again,04\n"
+        "p3,pw4,Three\n"
+    )
+    assert client.post("/register/bulk", content=csv_body).status_code == 401
+    auth = {"Authorization": f"Bearer {token}"}
+    assert client.post("/register/bulk", content=csv_body, headers=auth).status_code == 403
+    monkeypatch.setattr(token__auth, "ADMIN_USERNAMES", frozenset({"testuser"}))
+    # จองที่ hash เกิน BULK_HASH_QUEUE_LIMIT ตอบ 503
+    with monkeypatch.context() as patch:
+        patch.setattr(handler_auth, "BULK_HASH_QUEUE_LIMIT", 1)
+        assert client.post("/register/bulk", params={"chunk_size": 2}, content=csv_body, headers=auth).status_code == 503
+    resp = _post_with_timeout(
+        client, "/register/bulk", params={"chunk_size": 2, "progress": True},
+        content=csv_body.encode(), headers={"Content-Type": "text/csv", **auth},
+    )
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    # header ของ CSV นับเป็นบรรทัดหนึ่งของชุดแรก
+    assert [line["processed"] for line in lines[:-1]] == [1, 3, 5]
+    assert lines[-1] == {
+        "processed": 5, "created": 2,
+        "errors": [
+            {"row": 2, "error": "Username already exists"},
+            {"row": 4, "error": "Duplicate username in file (row 1)"},
+            {"row": 5, "error": "Column count does not match header"},
+        ],
+    }
+    assert client.post("/login/", data={"username": "p2", "password": "pw2"}).status_code == 200
+    assert client.get("/stats/").json()["users"]["total"] == 3
+
+    # CLI: รหัสผ่านถูก hash บน thread pool และผู้ใช้ที่มีแล้วถูกรายงานเป็น error
+    path = tmp_path / "users.ndjson"
+    path.write_text('{"username": "p4", "password": "x", "fullname": "F", "phone": "0"}\n{"username": "p1", "password": "x", "fullname": "F", "phone": "0"}\n')
+    monkeypatch.setattr(cli, "SessionLocal", lambda: session)
+    assert cli.main(["import-users", str(path), "--workers", "2"]) == 1
+    assert session.query(User).filter(User.username == "p4").count() == 1
@@ -0,0 +1,17 @@
+from benchmarks.stats import compare, percentile, summarize
+
+
+def test_summarize_percentiles():
+    """p50/p95/p99 แบบ nearest-rank หน่วยมิลลิวินาที"""
+    summary = summarize([i / 1000 for i in range(1, 101)], elapsed=2.0)
+    assert summary["throughput_rps"] == 50.0
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (50.0, 95.0, 99.0)
+    assert percentile([], 0.5) == 0.0
+
+
+def test_compare_flags_regressions():
+    """latency เพิ่มหรือ throughput ลดเกิน threshold ถือว่าถดถอย"""
+    baseline = {"load.100.GET /tax/": {"throughput_rps": 1000.0, "p99_ms": 10.0}}
+    current = {"load.100.GET /tax/": {"throughput_rps": 950.0, "p99_ms": 15.0}}
+    flags = {metric: regressed for _, metric, _, _, _, regressed in compare(current, baseline, threshold=10)}
+    assert flags == {"throughput_rps": False, "p99_ms": True}
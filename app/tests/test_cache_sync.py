@@ -0,0 +1,23 @@
+from fastapi.testclient import TestClient
+
+from app.catalog import tax_catalog
+
+
+def test_cache_versions_detect_writes_from_other_workers(client: TestClient, session):
+    """การเขียนของ worker เองไม่ล้าง catalog ส่วนการเขียนจาก worker อื่นถูกเห็นในการ check ครั้งถัดไป"""
+    from sqlalchemy import text
+    from app.cache_sync import cache_versions
+
+    cache_versions.check(session)
+    client.post("/tax/", json={"province": "ตาก", "reduce_tax_percent": 15.0})
+    assert len(client.get("/tax/").json()) == 1
+    assert cache_versions.check(session) == []
+    assert tax_catalog._snapshot is not None
+
+    # worker อื่น: เขียนข้อมูลและเพิ่มเลข version ใน transaction เดียวกัน
+    session.execute(text("INSERT INTO taxes (province, reduce_tax_percent, is_secondary) VALUES ('ตรัง', 10, 0)"))
+    session.execute(text("UPDATE cache_versions SET version = version + 1 WHERE name = 'taxes'"))
+    session.commit()
+    assert len(client.get("/tax/").json()) == 1  # ยังเป็น cache เดิมจนกว่าจะ check
+    assert cache_versions.check(session) == ["taxes"]
+    assert {row["province"] for row in client.get("/tax/").json()} == {"ตาก", "ตรัง"}
@@ -0,0 +1,37 @@
+import asyncio
+
+from sqlalchemy import create_engine, text
+
+from app import database
+from app.database import apply_sqlite_profile, run_write
+
+
+def test_tuned_profile_sets_pragmas(tmp_path):
+    """โปรไฟล์ tuned ต้องตั้ง WAL, synchronous=NORMAL และ busy_timeout ทุก connection"""
+    engine = create_engine(f"sqlite:///{tmp_path}/tuned.db")
+    apply_sqlite_profile(engine, "tuned")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT_MS
+
+
+def test_run_write_serializes_writers(monkeypatch):
+    """งานเขียนที่เรียกพร้อมกันต้องไม่ทับซ้อนกัน"""
+    monkeypatch.setattr(database, "SERIALIZE_WRITES", True)
+    active, overlaps = [], []
+
+    class Runner:
+        async def run_sync(self, fn, *args):
+            active.append(1)
+            if len(active) > 1:
+                overlaps.append(True)
+            await asyncio.sleep(0.01)
+            active.pop()
+            return fn(None, *args)
+
+    async def main():
+        return await asyncio.gather(*(run_write(Runner(), lambda db, i: i, i) for i in range(5)))
+
+    assert asyncio.run(main()) == [0, 1, 2, 3, 4]
+    assert overlaps == []
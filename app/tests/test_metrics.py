@@ -0,0 +1,54 @@
+import pytest
+
+from app.metrics import Histogram
+
+
+def _sample(text, prefix):
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_metrics_by_route_template(client):
+    """label route ต้องเป็น template ของ route และนับ SQL ของ request นั้นด้วย"""
+    client.get("/tax/nowhere")
+    client.get("/tax/nowhere-else")
+    body = client.get("/metrics").text
+
+    assert _sample(body, 'http_requests_total{method="GET",route="/tax/{province}",status="404"}') >= 2
+    assert "/tax/nowhere" not in body
+    assert _sample(body, 'http_request_duration_seconds_count{method="GET",route="/tax/{province}"}') >= 2
+    assert _sample(body, 'http_request_db_queries_sum{route="/tax/{province}"}') >= 1
+    assert "http_requests_in_flight 1" in body  # request /metrics เอง
+
+
+def test_histogram_buckets_are_cumulative():
+    """bucket ต้องเป็นยอดสะสมและ +Inf เท่ากับ count"""
+    histogram = Histogram("demo_seconds", "demo", ("op",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "x")
+    samples = dict(histogram.samples())
+    assert samples['demo_seconds_bucket{op="x",le="0.1"}'] == 1
+    assert samples['demo_seconds_bucket{op="x",le="1.0"}'] == 2
+    assert samples['demo_seconds_bucket{op="x",le="+Inf"}'] == 3
+    assert samples['demo_seconds_count{op="x"}'] == 3
+
+
+def test_failed_statement_leaves_no_timer_on_connection(engine):
+    """statement ที่ error ยังถูกนับ และไม่ทิ้งเวลาเริ่มไว้บน connection"""
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app.metrics import _request_db
+
+    stats = [0, 0.0]
+    token = _request_db.set(stats)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            conn.execute(text("SELECT 1"))
+            assert "query_start" not in conn.info
+    finally:
+        _request_db.reset(token)
+    assert stats[0] == 2
@@ -0,0 +1,39 @@
+import pytest
+
+from app import profiling
+from app.catalog import tax_catalog
+from app.profiling import profile_store
+
+
+@pytest.fixture(autouse=True)
+def profiling_enabled(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "secret-token")
+    profile_store.clear()
+
+
+def test_profile_by_header(client):
+    """header X-Profile ที่ถูกต้องต้องได้ profile พร้อม SQL และดาวน์โหลดไฟล์ .prof ได้"""
+    assert "x-profile-id" not in client.get("/tax/").headers
+    tax_catalog.invalidate()  # ให้ request ที่ profile ต้องโหลด catalog จากฐานข้อมูล
+
+    response = client.get("/tax/", headers={"X-Profile": "secret-token"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    auth = {"X-Profile": "secret-token"}
+    assert [p["id"] for p in client.get("/debug/profiles/", headers=auth).json()] == [profile_id]
+    detail = client.get(f"/debug/profiles/{profile_id}", headers=auth).json()
+    assert detail["route"] == "/tax/"
+    assert any("FROM tax" in s["sql"] for s in detail["statements"])
+    assert "get_all_taxes" in detail["stats"]
+
+    download = client.get(f"/debug/profiles/{profile_id}/download", headers=auth)
+    assert download.headers["content-type"] == "application/octet-stream"
+    assert client.get("/debug/profiles/", headers={"X-Profile": "wrong"}).status_code == 403
+
+
+def test_wrong_token_is_not_profiled(client):
+    """token ผิดต้องไม่ถูก profile และไม่มีอะไรถูกเก็บ"""
+    response = client.get("/tax/", headers={"X-Profile": "wrong"})
+    assert "x-profile-id" not in response.headers
+    assert profile_store.list() == []
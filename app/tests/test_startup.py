@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.database import get_session
+
+# รันใน process ใหม่ เพราะ process ของ pytest import ทุกอย่างไปแล้ว
+STARTUP_SCRIPT = """
+import sys
+import app.main
+import app.database as database
+assert not database._lazy, database._lazy
+assert "jose" not in sys.modules and "passlib" not in sys.modules
+
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+from app.catalog import tax_catalog
+
+with TestClient(app.main.app):
+    assert tax_catalog._snapshot is not None
+    assert "passlib" in sys.modules
+    assert {"users", "taxes", "travels"} <= set(inspect(database.get_engine()).get_table_names())
+"""
+
+
+def test_import_is_lazy_and_prewarm_creates_schema(tmp_path):
+    """import app.main ไม่สร้าง engine และไม่โหลด jose/passlib ส่วน prewarm สร้าง schema และโหลด catalog"""
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}", PREWARM_ON_STARTUP="1")
+    result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_startup_phases_are_exported():
+    """เวลาแต่ละช่วงของ startup อยู่ใน /metrics"""
+    # override session ทำให้ prewarm ข้ามส่วนฐานข้อมูล
+    app.dependency_overrides[get_session] = lambda: None
+    try:
+        with TestClient(app) as client:
+            text = client.get("/metrics").text
+    finally:
+        app.dependency_overrides.clear()
+    for phase in ("import", "auth", "ready"):
+        assert f'app_startup_seconds{{phase="{phase}"}}' in text
@@ -0,0 +1,47 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.auth import create_access_token, get_admin_user
+from app.models import StatCounter, User
+
+# /tax/bulk และ POST /stats/reconcile เป็น endpoint ของผู้ดูแล
+pytestmark = pytest.mark.usefixtures("admin")
+
+
+def test_stats_counters_and_reconcile(client: TestClient, session):
+    """/stats นับตาม insert โดยไม่ scan ตาราง, bulk upsert ทำให้สร้างใหม่ และ reconcile แก้ค่าที่คลาดเคลื่อน"""
+    empty = client.get("/stats/").json()
+    assert empty["taxes"]["total"] == 0 and empty["taxes"]["rate"]["avg"] is None
+
+    client.post("/tax/", json={"province": "ตาก", "reduce_tax_percent": 15.0, "is_secondary": 1})
+    client.post("/tax/", json={"province": "ตรัง", "reduce_tax_percent": 10.0})
+    client.post("/travel/", json={"province": "ตาก", "description": "x", "tax_reduction": 3.0, "is_secondary": 1})
+    client.post("/tax/", json={"province": "ตรัง", "reduce_tax_percent": 99.0})  # ซ้ำ ไม่ถูกนับ
+    body = client.get("/stats/").json()
+    assert body["taxes"] == {
+        "total": 2, "secondary": 1, "main": 1,
+        "rate": {"count": 2, "min": 10.0, "avg": 12.5, "max": 15.0},
+    }
+    assert body["travels"]["total"] == 1 and body["travels"]["rate"]["max"] == 3.0
+
+    # upsert แก้อัตราของแถวเดิม: ตัวนับถูกสร้างใหม่จากตาราง
+    client.post("/tax/bulk", content='{"province": "ตาก", "reduce_tax_percent": 5.0, "is_secondary": 1}\n')
+    assert client.get("/stats/").json()["taxes"]["rate"] == {"count": 2, "min": 5.0, "avg": 7.5, "max": 10.0}
+
+    # is_secondary อื่นที่ไม่ใช่ 1 ไม่นับเป็นจังหวัดรอง ทั้งตอน insert และตอน reconcile
+    client.post("/tax/", json={"province": "ตราด", "reduce_tax_percent": 10.0, "is_secondary": 2})
+    assert client.get("/stats/").json()["taxes"]["secondary"] == 1
+    assert client.post("/stats/reconcile").json() == {"reconciled": []}
+
+    session.query(StatCounter).filter(StatCounter.name == "taxes").update({"total": 50})
+    session.commit()
+    assert client.post("/stats/reconcile").json() == {"reconciled": ["taxes"]}
+    assert client.get("/stats/").json()["taxes"]["total"] == 3
+
+    del app.dependency_overrides[get_admin_user]
+    assert client.post("/stats/reconcile").status_code == 401
+    session.add(User(username="editor", hashed_password="x", fullname="E", phone="0"))
+    session.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'editor'})}"}
+    assert client.post("/stats/reconcile", headers=headers).status_code == 403
@@ -1,59 +1,21 @@
+import asyncio
+
 import pytest
 from fastapi.testclient import TestClient # ใช้ TestClient แบบ Synchronous
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base 
 
 # นำเข้า app หลักของคุณ
 from app.main import app 
 
-# นำเข้า Base และ get_db จากไฟล์ database ของคุณ
-from app.database import Base, get_db, engine as app_engine 
+from app.auth import create_access_token, get_admin_user
 
 # นำเข้าโมเดล Tax ของคุณ
-from app.models import Tax 
-
-# --- การตั้งค่าฐานข้อมูลทดสอบ ---
-SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///:memory:"
-
-test_engine = create_engine(
-    SQLALCHEMY_TEST_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-
-TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
-
-# --- Fixtures สำหรับการทดสอบ ---
+from app.models import Tax, User
+from app.catalog import tax_catalog
 
-@pytest.fixture(name="session")
-def session_fixture():
-    """
-    Fixture ที่ให้ Database Session สำหรับการทดสอบแต่ละครั้ง
-    และจัดการการสร้าง/ลบตาราง (เพื่อให้ฐานข้อมูลสะอาดเสมอ)
-    """
-    Base.metadata.drop_all(test_engine)
-    Base.metadata.create_all(test_engine) 
-    db = TestSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-        # ไม่จำเป็นต้อง drop_all อีกครั้งถ้าเรียกก่อนแล้ว
-
-@pytest.fixture(name="client")
-def client_fixture(session):
-    """
-    Fixture ที่ให้ TestClient สำหรับการทดสอบ
-    และ override dependency get_db ให้ใช้ session ทดสอบ
-    """
-    def override_get_db():
-        yield session
+# fixture session/client อยู่ใน conftest.py ส่วน /bulk ใช้ผู้ใช้ทดสอบที่เป็นผู้ดูแล
+# (การตรวจสิทธิ์จริงทดสอบใน test_bulk_requires_admin)
+pytestmark = pytest.mark.usefixtures("admin")
 
-    app.dependency_overrides[get_db] = override_get_db
-    
-    with TestClient(app) as client:
-        yield client
-    
-    app.dependency_overrides.clear() 
 
 @pytest.fixture
 def tax_data():
@@ -97,4 +59,246 @@ def test_get_tax_by_non_existent_province(client: TestClient):
 
     # ⭐ คาดหวัง 404 Not Found ⭐
     assert get_resp.status_code == 404
-    assert get_resp.json()["detail"] == "Tax info not found" # ข้อความ Error ที่คุณกำหนดใน Router
\ No newline at end of file
+    assert get_resp.json()["detail"] == "Tax info not found" # ข้อความ Error ที่คุณกำหนดใน Router
+
+
+def test_catalog_serves_reads_and_updates_on_create(client: TestClient, tax_data):
+    """
+    การอ่านหลังจากโหลดครั้งแรกต้องมาจาก catalog และ create_tax ต้องอัปเดต catalog ทันที
+    """
+    assert client.get("/tax/").json() == []
+    version = tax_catalog.version
+
+    create_resp = client.post("/tax/", json=tax_data)
+    assert create_resp.status_code == 201
+    assert tax_catalog.version > version
+
+    assert client.get(f"/tax/{tax_data['province']}").json() == create_resp.json()
+    secondary = client.get("/tax/secondary/").json()
+    assert [row["province"] for row in secondary] == [tax_data["province"]]
+
+
+def test_etag_follows_cache_versions_without_hashing_rows(client: TestClient, tax_data):
+    """ETag มาจากเลขใน cache_versions ทั้งตอนโหลดและหลัง put() ไม่ต้อง hash ทั้งตาราง"""
+    client.post("/tax/", json={"province": "A", "reduce_tax_percent": 1.0})
+    tax_catalog.invalidate()
+    etag = client.get("/tax/").headers["etag"]
+    assert tax_catalog._snapshot.digest == "v1"
+
+    client.post("/tax/", json=tax_data)
+    assert tax_catalog._snapshot.digest == "v2"
+    assert client.get("/tax/").headers["etag"] != etag
+
+    # โหลดใหม่ (เช่น worker อื่น) ได้ค่าเดียวกับที่ put() ให้
+    tax_catalog.invalidate()
+    etag = client.get("/tax/").headers["etag"]
+    tax_catalog.invalidate()
+    assert client.get("/tax/").headers["etag"] == etag
+
+
+def test_get_all_taxes_pagination_projection_and_filters(client: TestClient):
+    """
+    แบ่งหน้าด้วย cursor, เลือกคอลัมน์ด้วย fields และกรองด้วย is_secondary / ช่วงเปอร์เซ็นต์
+    """
+    for i in range(5):
+        client.post("/tax/", json={
+            "province": f"P{i}", "reduce_tax_percent": float(i * 5), "is_secondary": i % 2, "description": None
+        })
+
+    first = client.get("/tax/", params={"limit": 2})
+    assert [row["province"] for row in first.json()] == ["P0", "P1"]
+    second = client.get("/tax/", params={"limit": 2, "cursor": first.headers["x-next-cursor"]})
+    assert [row["province"] for row in second.json()] == ["P2", "P3"]
+    last = client.get("/tax/", params={"limit": 2, "cursor": second.headers["x-next-cursor"]})
+    assert [row["province"] for row in last.json()] == ["P4"]
+    assert "x-next-cursor" not in last.headers
+
+    projected = client.get("/tax/", params={"fields": "province,reduce_tax_percent", "is_secondary": 1})
+    assert projected.json() == [
+        {"province": "P1", "reduce_tax_percent": 5.0},
+        {"province": "P3", "reduce_tax_percent": 15.0},
+    ]
+
+    ranged = client.get("/tax/", params={"min_reduce_tax_percent": 5, "max_reduce_tax_percent": 10})
+    assert [row["province"] for row in ranged.json()] == ["P1", "P2"]
+
+    assert client.get("/tax/", params={"fields": "password"}).status_code == 400
+
+
+def test_snapshot_page_filters_match_full_scan():
+    """หน้าที่ได้จาก index (ช่วงแคบ, is_secondary ค่าอื่น) ตรงกับการไล่กรองทั้งตาราง"""
+    from app.catalog import CatalogSnapshot, _in_ranges
+
+    rows = [
+        {"id": i, "province": f"P{i}", "reduce_tax_percent": float(i % 37) if i % 5 else None, "is_secondary": i % 3}
+        for i in range(1, 301)
+    ]
+    snapshot = CatalogSnapshot(1, rows)
+    cases = [(None, (3, 4)), (0, (None, 2)), (2, (30, None)), (0, (None, None)), (None, (100, None)), (1, (0, 36))]
+    for is_secondary, bounds in cases:
+        ranges = {"reduce_tax_percent": bounds}
+        expected = [
+            row["id"] for row in rows
+            if (is_secondary is None or row["is_secondary"] == is_secondary)
+            and (bounds == (None, None) or _in_ranges(row, ranges))
+        ]
+        found, cursor = [], None
+        while True:
+            page, cursor = snapshot.page(cursor, 7, is_secondary, ranges)
+            found += [row["id"] for row in page]
+            if cursor is None:
+                break
+        assert found == expected, (is_secondary, bounds)
+
+
+def test_bulk_upsert_taxes(client: TestClient):
+    """
+    นำเข้า CSV แบบทีละ chunk พร้อมรายงานแถวที่ผิด แล้ว upsert ซ้ำด้วย NDJSON แบบ atomic
+    """
+    csv_body = "province,reduce_tax_percent,is_secondary,description\n" \
+               "A,5,0,\n" \
+               "B,not-a-number,1,x\n" \
+               "C,7.5,1,เมืองรอง\n"
+    resp = client.post("/tax/bulk", params={"chunk_size": 1}, content=csv_body.encode(), headers={"Content-Type": "text/csv"})
+    report = resp.json()
+    assert resp.status_code == 200
+    assert (report["processed"], report["upserted"], report["committed"]) == (3, 2, True)
+    assert [error["row"] for error in report["errors"]] == [2]
+    assert client.get("/tax/C").json()["description"] == "เมืองรอง"
+
+    ndjson_body = '{"province": "A", "reduce_tax_percent": 9}\n{"province": "D", "reduce_tax_percent": 1}\n'
+    resp = client.post("/tax/bulk", params={"atomic": True}, content=ndjson_body, headers={"Content-Type": "application/x-ndjson"})
+    assert resp.json()["upserted"] == 2
+    assert client.get("/tax/A").json()["reduce_tax_percent"] == 9
+    assert len(client.get("/tax/").json()) == 3
+
+    # บรรทัดที่ไม่ใช่ UTF-8 (เช่นไฟล์ TIS-620) เป็น error ของแถวนั้น ไม่ใช่ 500
+    cp874_body = b"province,reduce_tax_percent\n" + "ตาก".encode("cp874") + b",1\nF,2\n"
+    report = client.post("/tax/bulk", content=cp874_body, headers={"Content-Type": "text/csv"}).json()
+    assert (report["upserted"], [error["row"] for error in report["errors"]]) == (1, [1])
+    assert report["errors"][0]["error"].startswith("Invalid UTF-8")
+    # atomic + มีแถวผิด -> ไม่มีอะไรถูกบันทึก
+    resp = client.post("/tax/bulk", params={"atomic": True}, content='{"province": "E", "reduce_tax_percent": 1}\n[1]\n')
+    assert resp.json()["committed"] is False
+    assert client.get("/tax/E").status_code == 404
+
+
+def test_bulk_requires_admin(client: TestClient, session):
+    """upsert แก้อัตราที่มีอยู่แล้วได้ จึงต้อง login เป็นผู้ดูแล"""
+    del app.dependency_overrides[get_admin_user]
+    body = '{"province": "A", "reduce_tax_percent": 1}\n'
+    assert client.post("/tax/bulk", content=body).status_code == 401
+    assert client.post("/travel/bulk", content='{"province": "A", "description": "x"}\n').status_code == 401
+    session.add(User(username="editor", hashed_password="x", fullname="E", phone="0"))
+    session.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'editor'})}"}
+    assert client.post("/tax/bulk", content=body, headers=headers).status_code == 403
+    assert client.get("/tax/A").status_code == 404
+
+
+def test_atomic_bulk_reads_body_before_write_lock(monkeypatch):
+    """โหมด atomic อ่าน body จนจบก่อนขอ write lock การ upload ที่ช้าจึงไม่กันงานเขียนอื่น"""
+    from app import bulk, database
+    from app.schemas import TaxCreate
+
+    monkeypatch.setattr(database, "SERIALIZE_WRITES", True)
+    held = []
+
+    async def body():
+        held.append(database.write_lock().locked())
+        yield b'{"province": "A", "reduce_tax_percent": 1}\n'
+
+    class Runner:
+        async def run_sync(self, fn, *args):
+            held.append(database.write_lock().locked())
+
+    importer = bulk.BulkImporter(Tax, TaxCreate, "ndjson", atomic=True)
+    asyncio.run(bulk.import_stream(Runner(), importer, body(), 10))
+    assert held == [False, True, True]
+
+
+def test_cli_import_tax(session, session_factory, tmp_path, monkeypatch):
+    """คำสั่ง python -m app.cli import-tax ใช้ BulkImporter ตัวเดียวกับ endpoint"""
+    from app import cli
+
+    monkeypatch.setattr(cli, "SessionLocal", session_factory)
+    path = tmp_path / "taxes.csv"
+    path.write_text("province,reduce_tax_percent\nX,1\nY,2\n", encoding="utf-8")
+
+    assert cli.main(["import-tax", str(path), "--atomic"]) == 0
+    assert [tax.province for tax in session.query(Tax).order_by(Tax.id)] == ["X", "Y"]
+
+
+def test_calculate_trip_deductions(client: TestClient):
+    """
+    คำนวณลดหย่อนหลายทริป: เพดานแยกจังหวัดหลัก/รอง และทริปที่ไม่พบจังหวัด
+    """
+    client.post("/tax/", json={"province": "Main", "reduce_tax_percent": 10.0, "is_secondary": 0})
+    client.post("/tax/", json={"province": "Second", "reduce_tax_percent": 50.0, "is_secondary": 1})
+
+    resp = client.post("/tax/calculate", json={"trips": [
+        {"province": "Main", "spend": 100000},
+        {"province": "Main", "spend": 100000},
+        {"province": "Second", "spend": 10000},
+        {"province": "Unknown", "spend": 500},
+        {"province": "Second", "spend": 10000, "start_date": "2025-02-01", "end_date": "2025-01-01"},
+    ]})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [trip["deduction"] for trip in body["trips"]] == [10000.0, 5000.0, 5000.0, 0.0, 0.0]
+    assert body["trips"][3]["reason"] == "Province not found"
+    assert body["trips"][4]["eligible"] is False
+    assert (body["total_main"], body["total_secondary"], body["total"]) == (15000.0, 5000.0, 20000.0)
+
+
+def test_list_bytes_match_response_model(client: TestClient):
+    """bytes ที่ cache ไว้ใน snapshot ต้องตรงกับที่ response_model=list[TaxResponse] สร้างทุกไบต์"""
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app.schemas import TaxResponse
+
+    client.post("/tax/", json={"province": "เชียงใหม่", "reduce_tax_percent": 15, "description": "เมือง \"เหนือ\"\n"})
+    client.post("/tax/", json={"province": "น่าน", "reduce_tax_percent": 0.1, "is_secondary": 1})
+
+    resp = client.get("/tax/")
+    expected = JSONResponse(jsonable_encoder([TaxResponse.model_validate(row) for row in resp.json()])).body
+    assert resp.content == expected
+    assert resp.headers["content-type"] == "application/json"
+    assert client.get("/tax/น่าน").content == JSONResponse(jsonable_encoder(TaxResponse.model_validate(resp.json()[1]))).body
+
+
+def test_export_streams_csv_and_ndjson(client: TestClient):
+    """ส่งออกทั้งตารางเป็น NDJSON/CSV ทีละ chunk และบีบอัด gzip เมื่อ client รองรับ"""
+    import json
+
+    for i in range(5):
+        client.post("/tax/", json={"province": f"P{i}", "reduce_tax_percent": i, "description": "ไทย, \"quoted\""})
+
+    resp = client.get("/tax/export", params={"chunk_size": 2}, headers={"Accept-Encoding": "identity"})
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    assert "content-encoding" not in resp.headers
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [row["province"] for row in rows] == ["P0", "P1", "P2", "P3", "P4"]
+
+    resp = client.get("/tax/export", params={"format": "csv", "chunk_size": 2}, headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert resp.headers["content-disposition"] == 'attachment; filename="taxes.csv"'
+    lines = resp.text.splitlines()
+    assert lines[0] == "id,province,reduce_tax_percent,is_secondary,description"
+    assert lines[1] == '1,P0,0.0,0,"ไทย, ""quoted"""'
+    assert len(lines) == 6
+
+
+def test_batch_lookup(client: TestClient):
+    """POST /tax/batch คืนผลตามจังหวัดที่ขอ พร้อม null และ not_found สำหรับจังหวัดที่ไม่มี"""
+    client.post("/tax/", json={"province": "ตาก", "reduce_tax_percent": 15.0, "is_secondary": 1})
+    client.post("/tax/", json={"province": "ตรัง", "reduce_tax_percent": 10.0})
+
+    resp = client.post("/tax/batch", json={"provinces": ["ตรัง", "ไม่มี", "ตาก", "ตรัง"]})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert list(body["results"]) == ["ตรัง", "ไม่มี", "ตาก"]
+    assert body["results"]["ตาก"] == client.get("/tax/ตาก").json()
+    assert body["results"]["ไม่มี"] is None
+    assert body["not_found"] == ["ไม่มี"]
+    assert client.post("/tax/batch", json={"provinces": []}).status_code == 422
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.main import app
+from app.database import Base, get_session
+from app.catalog import travel_catalog
+from app.models import Travel
+
+
+@pytest.fixture(name="async_client")
+def async_client_fixture(tmp_path):
+    """ใช้ AsyncSession (aiosqlite) จริงบนไฟล์ชั่วคราว"""
+    url = f"sqlite:///{tmp_path}/travel.db"
+    Base.metadata.create_all(create_engine(url))
+    async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"), poolclass=NullPool)
+    AsyncTestSession = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_session():
+        async with AsyncTestSession() as db:
+            yield db
+
+    app.dependency_overrides[get_session] = override_get_session
+    travel_catalog.invalidate()
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+    travel_catalog.invalidate()
+
+
+def test_create_and_get_travel(client: TestClient):
+    """สร้างข้อมูลท่องเที่ยวแล้วอ่านกลับทั้งแบบรายการและตามจังหวัด"""
+    assert client.get("/travel/").json() == []
+
+    resp = client.post("/travel/", json={
+        "province": "น่าน", "description": "เมืองรอง", "tax_reduction": 20.0, "is_secondary": 1
+    })
+    assert resp.status_code == 200
+
+    assert client.get("/travel/").json() == [resp.json()]
+    assert client.get("/travel/secondary/").json() == [resp.json()]
+    assert client.get("/travel/น่าน").json() == resp.json()
+    assert client.get("/travel/ไม่มี").status_code == 404
+
+
+
+def test_travel_with_async_session(async_client: TestClient):
+    """handler ชุดเดียวกันต้องทำงานบน AsyncSession ได้ด้วย"""
+    resp = async_client.post("/travel/", json={"province": "เชียงใหม่", "description": "เมืองหลัก"})
+    assert resp.status_code == 200
+    assert async_client.get("/travel/").json() == [resp.json()]
+    assert async_client.get("/travel/เชียงใหม่").json()["tax_reduction"] == 0.0
+
+
+def test_travel_etag_and_not_modified(client: TestClient):
+    """ตอบ 304 เมื่อ If-None-Match ตรงกับ ETag และ ETag เปลี่ยนหลังการเขียน"""
+    client.post("/travel/", json={"province": "น่าน", "description": "เมืองรอง", "is_secondary": 1})
+
+    first = client.get("/travel/")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"].startswith("public, max-age=")
+
+    cached = client.get("/travel/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    # URL อื่นได้ ETag อื่น
+    assert client.get("/travel/น่าน").headers["etag"] != etag
+
+    client.post("/travel/", json={"province": "แพร่", "description": "เมืองรอง"})
+    assert client.get("/travel/", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_search_thai_and_romanized(client):
+    """ค้นได้ทั้งชื่อไทย อักษรโรมัน ขึ้นต้นด้วย และสะกดคลาดเล็กน้อย และเจอจังหวัดที่เพิ่มทีหลัง"""
+    client.post("/travel/", json={"province": "เชียงใหม่", "description": "เหนือ"})
+    client.post("/travel/", json={"province": "เชียงราย", "description": "เหนือ"})
+
+    assert client.get("/search/", params={"q": "Chiang Mai"}).json()[0] == {
+        "province": "เชียงใหม่", "score": 1.0, "sources": ["travel"],
+    }
+    assert [m["province"] for m in client.get("/search/", params={"q": "chiang"}).json()] == ["เชียงราย", "เชียงใหม่"]
+    assert client.get("/search/", params={"q": "เชียงใหม"}).json()[0]["province"] == "เชียงใหม่"  # ไม่มีวรรณยุกต์
+    assert client.get("/search/", params={"q": "chang mai"}).json()[0]["province"] == "เชียงใหม่"
+
+    # index ถูกสร้างแล้ว จังหวัดใหม่ต้องถูกเพิ่มโดยไม่ต้องสร้างใหม่ทั้งหมด
+    client.post("/travel/", json={"province": "Phuket", "description": "ใต้"})
+    assert client.get("/search/", params={"q": "ภูเก็ต"}).json()[0]["province"] == "Phuket"
+    assert client.get("/search/", params={"q": "phuket", "source": "tax"}).json() == []
+
+
+def test_province_detail_joins_travel_and_tax(client):
+    """รายละเอียดจังหวัดรวม travel กับ tax และอัปเดตทันทีเมื่อมีการเพิ่ม tax"""
+    from app.catalog import tax_catalog
+
+    tax_catalog.invalidate()
+    client.post("/travel/", json={"province": "น่าน", "description": "เมืองเก่า", "tax_reduction": 5.0, "is_secondary": 1})
+
+    detail = client.get("/provinces/น่าน").json()
+    assert (detail["effective_tax_percent"], detail["tax_rule_source"], detail["tax"]) == (5.0, "travel", None)
+    assert detail["travel"]["description"] == "เมืองเก่า"
+
+    # Tax เป็นตารางหลักของกติกาภาษี เมื่อมีแล้วต้องใช้ค่าจาก Tax แทน tax_reduction ที่อาจไม่ตรงกัน
+    client.post("/tax/", json={"province": "น่าน", "reduce_tax_percent": 15.0, "is_secondary": 1})
+    detail = client.get("/provinces/น่าน").json()
+    assert (detail["effective_tax_percent"], detail["tax_rule_source"]) == (15.0, "tax")
+
+    batch = client.post("/provinces/batch", json={"provinces": ["น่าน", "ไม่มี"]}).json()
+    assert batch["results"]["น่าน"]["effective_tax_percent"] == 15.0
+    assert batch["results"]["ไม่มี"] is None
+    assert batch["not_found"] == ["ไม่มี"]
+    assert client.get("/provinces/ไม่มี").status_code == 404
+    tax_catalog.invalidate()
+
+
+def _put_during_first_snapshot(monkeypatch):
+    """snapshot_async ครั้งแรกของ travel_catalog คืน snapshot เดิม แต่มี put แทรกเข้ามาก่อนคืน"""
+    original = travel_catalog.snapshot_async
+    calls = []
+
+    async def snapshot_async(db):
+        snap = await original(db)
+        if not calls:
+            calls.append(db)
+            travel_catalog.put(Travel(id=99, province="แพร่", description="เมืองรอง", tax_reduction=None, is_secondary=1))
+        return snap
+    monkeypatch.setattr(travel_catalog, "snapshot_async", snapshot_async)
+
+
+def test_province_view_keeps_put_during_build(client, monkeypatch):
+    """put ที่เกิดระหว่างสร้างมุมมองครั้งแรกต้องไม่หายไป"""
+    from app.province_view import ProvinceDetailView
+
+    client.post("/travel/", json={"province": "น่าน", "description": "เมืองรอง"})
+    client.get("/travel/")
+    client.get("/tax/")  # โหลด snapshot ไว้ มุมมองจึงไม่ต้องใช้ session
+    _put_during_first_snapshot(monkeypatch)
+    view = ProvinceDetailView()
+    assert set(asyncio.run(view.details(None))) == {"น่าน", "แพร่"}
+
+
+def test_search_index_keeps_put_during_build(client, monkeypatch):
+    """จังหวัดที่ถูก put ระหว่างสร้าง index ครั้งแรกต้องค้นเจอ"""
+    from app.search import ProvinceSearchIndex
+
+    client.post("/travel/", json={"province": "น่าน", "description": "เมืองรอง"})
+    client.get("/travel/")
+    _put_during_first_snapshot(monkeypatch)
+    index = ProvinceSearchIndex({"travel": travel_catalog})
+    asyncio.run(index.ensure(None))
+    assert [match["province"] for match in index.search("แพร่")] == ["แพร่"]
+
+
+def test_search_index_answers_when_writes_never_stop(client, monkeypatch):
+    """ถ้ามี put แทรกทุกครั้งที่สร้าง index ยังค้นจาก snapshot ชุดล่าสุดได้ (แต่ไม่ติดตั้ง)"""
+    from app.search import MAX_BUILD_ATTEMPTS, ProvinceSearchIndex
+
+    client.post("/travel/", json={"province": "น่าน", "description": "เมืองรอง"})
+    client.get("/travel/")
+    original = travel_catalog.snapshot_async
+    calls = []
+
+    async def snapshot_async(db):
+        snap = await original(db)
+        calls.append(db)
+        travel_catalog.put(Travel(id=100 + len(calls), province=f"เมือง{len(calls)}", description="", tax_reduction=None, is_secondary=1))
+        return snap
+    monkeypatch.setattr(travel_catalog, "snapshot_async", snapshot_async)
+
+    index = ProvinceSearchIndex({"travel": travel_catalog})
+    names = asyncio.run(index.ensure(None))
+    assert len(calls) == MAX_BUILD_ATTEMPTS
+    assert [match["province"] for match in index.search("น่าน", names=names)] == ["น่าน"]
+    assert not index._built
@@ -0,0 +1,15 @@
+"""ชุด benchmark ที่รันในเครื่องได้โดยไม่ต้องใช้ network
+
+    python -m benchmarks                       # micro + load ที่ 100 และ 10k แถว
+    python -m benchmarks --rows 100,10000,1000000 --save benchmarks/baseline.json
+    python -m benchmarks --compare benchmarks/baseline.json
+
+ค่า config ที่จำเป็นถูกตั้งค่า default ไว้ที่นี่ ถ้าไม่มี .env
+"""
+import os
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+# load test ยิง /login/ ถี่จาก IP เดียว ซึ่งจะโดน rate limit
+os.environ.setdefault("LOGIN_RATE_LIMIT_ENABLED", "0")
@@ -0,0 +1,73 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import benchmarks  # noqa: F401  ตั้งค่า env default ก่อน import app
+from benchmarks import micro
+from benchmarks.stats import compare
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--rows", default="100,10000", help="comma-separated seed sizes for the load test")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per route")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args(argv)
+
+    results = {}
+    if not args.skip_micro:
+        results.update(micro.run())
+    if not args.skip_load:
+        for rows in (int(value) for value in args.rows.split(",") if value):
+            # แยก process ต่อขนาดข้อมูล เพราะ app อ่าน DATABASE_URL ตอน import
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.load", "--rows", str(rows),
+                 "--concurrency", str(args.concurrency), "--duration", str(args.duration)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            results.update(json.loads(output.strip().splitlines()[-1]))
+
+    for name, metrics in results.items():
+        print(f"{name:45} " + "  ".join(f"{key}={value}" for key, value in metrics.items()))
+
+    if args.save:
+        document = {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+        }
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(document, file, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        rows = compare(results, baseline["results"], args.threshold)
+        print(f"\ncompared with {baseline.get('commit')} ({baseline.get('created_at')})")
+        for name, metric, before, after, change, regressed in rows:
+            flag = "REGRESSION" if regressed else ""
+            print(f"{name:45} {metric:15} {before:>12} -> {after:<12} {change:+.1f}% {flag}")
+        if any(row[-1] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
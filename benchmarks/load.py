@@ -0,0 +1,165 @@
+"""load test แบบ concurrent ผ่าน HTTP จริงกับ uvicorn ที่รันในเครื่อง
+
+    python -m benchmarks.load --rows 10000 --concurrency 32 --duration 3
+
+สร้างฐานข้อมูลชั่วคราวที่มีข้อมูล tax/travel ตามจำนวนแถวที่ระบุ เปิด uvicorn ใน process ลูก
+(เพื่อไม่ให้แย่ง GIL กับตัวยิง request) แล้วยิงแต่ละ route ตามเวลาที่กำหนด
+ผลลัพธ์เป็น JSON ทาง stdout
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+
+import benchmarks  # noqa: F401  ตั้งค่า env default ก่อน import app
+from benchmarks.stats import summarize
+
+SEED_USERS = 50
+SEED_PASSWORD = "benchmark-password"
+SEED_CHUNK = 10000
+
+
+def seed(database_url: str, rows: int) -> None:
+    from sqlalchemy import create_engine, insert
+
+    from app.auth import get_password_hash
+    from app.database import Base
+    from app.models import Tax, Travel, User
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    password_hash = get_password_hash(SEED_PASSWORD)
+    with engine.begin() as conn:
+        for start in range(1, rows + 1, SEED_CHUNK):
+            ids = range(start, min(start + SEED_CHUNK, rows + 1))
+            conn.execute(insert(Tax), [
+                {"province": f"province-{i}", "reduce_tax_percent": float(i % 30), "is_secondary": i % 2, "description": "seed"}
+                for i in ids
+            ])
+            conn.execute(insert(Travel), [
+                {"province": f"province-{i}", "description": "seed", "tax_reduction": float(i % 30), "is_secondary": i % 2}
+                for i in ids
+            ])
+        conn.execute(insert(User), [
+            {"username": f"seed-{i}", "hashed_password": password_hash, "fullname": "Seed", "phone": "0"}
+            for i in range(SEED_USERS)
+        ])
+    engine.dispose()
+
+
+def _serve(database_url: str, port: int) -> None:
+    os.environ["DATABASE_URL"] = database_url
+    import uvicorn
+
+    uvicorn.run("app.main:app", host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def scenarios(rows: int):
+    pick = lambda: f"province-{random.randint(1, rows)}"  # noqa: E731
+    return {
+        "GET /tax/": lambda i: ("GET", "/tax/", {}),
+        "GET /tax/secondary/": lambda i: ("GET", "/tax/secondary/", {}),
+        "GET /tax/{province}": lambda i: ("GET", f"/tax/{pick()}", {}),
+        "POST /tax/batch (20)": lambda i: ("POST", "/tax/batch", {"json": {"provinces": [pick() for _ in range(20)]}}),
+        "GET /travel/": lambda i: ("GET", "/travel/", {}),
+        "GET /travel/{province}": lambda i: ("GET", f"/travel/{pick()}", {}),
+        "POST /login/": lambda i: ("POST", "/login/", {"data": {"username": f"seed-{i % SEED_USERS}", "password": SEED_PASSWORD}}),
+        "POST /register/": lambda i: ("POST", "/register/", {"json": {
+            "username": f"bench-{os.getpid()}-{i}", "password": SEED_PASSWORD, "fullname": "Bench", "phone": "0",
+        }}),
+    }
+
+
+async def run_scenario(client, make_request, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    counter = itertools.count()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            method, url, kwargs = make_request(next(counter))
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def _wait_ready(client, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def _drive(port: int, rows: int, concurrency: int, duration: float, only) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        await _wait_ready(client)
+        results = {}
+        for name, make_request in scenarios(rows).items():
+            if only and name not in only:
+                continue
+            results[f"load.{rows}.{name}"] = await run_scenario(client, make_request, concurrency, duration)
+        return results
+
+
+def run(rows: int, concurrency: int = 32, duration: float = 3.0, only=None) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{tmp}/bench.db"
+        seed(database_url, rows)
+        port = _free_port()
+        server = multiprocessing.get_context("spawn").Process(target=_serve, args=(database_url, port), daemon=True)
+        server.start()
+        try:
+            return asyncio.run(_drive(port, rows, concurrency, duration, only))
+        finally:
+            server.terminate()
+            server.join()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per route")
+    parser.add_argument("--route", action="append", help="run only this route (repeatable), e.g. 'GET /tax/'")
+    args = parser.parse_args(argv)
+    json.dump(run(args.rows, args.concurrency, args.duration, args.route), sys.stdout, ensure_ascii=False)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
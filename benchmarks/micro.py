@@ -0,0 +1,52 @@
+"""micro-benchmark ของงานที่อยู่บน hot path ของแต่ละ request"""
+import timeit
+
+from app.auth import create_access_token, decode_access_token, get_password_hash, verify_password
+from app.catalog import CatalogSnapshot, tax_catalog
+from app.schemas import TaxResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def _rows(count: int):
+    return [
+        {"id": i, "province": f"Province {i}", "reduce_tax_percent": 15.0, "is_secondary": i % 2, "description": "จังหวัดทดสอบ"}
+        for i in range(1, count + 1)
+    ]
+
+
+def _serialize_default(rows):
+    # เส้นทางเดียวกับที่ FastAPI ใช้กับ response_model=list[TaxResponse]
+    models = [TaxResponse.model_validate(row) for row in rows]
+    return JSONResponse(jsonable_encoder(models)).body
+
+
+def _serialize_fast(snapshot):
+    # เส้นทางของ GET /tax/: ต่อ bytes ของแต่ละแถวที่ cache ไว้ใน snapshot
+    return snapshot.rows_json(snapshot.rows)
+
+
+def cases():
+    password_hash = get_password_hash("benchmark-password")
+    token = create_access_token({"sub": "benchmark-user"})
+    rows = _rows(100)
+    snapshot = CatalogSnapshot(1, rows, tax_catalog.encode_row)
+    return {
+        "verify_password": lambda: verify_password("benchmark-password", password_hash),
+        "create_access_token": lambda: create_access_token({"sub": "benchmark-user"}),
+        "decode_access_token": lambda: decode_access_token(token),
+        "serialize_tax_list_100": lambda: _serialize_default(rows),
+        "serialize_tax_list_100_cached": lambda: _serialize_fast(snapshot),
+    }
+
+
+def run(min_time: float = 0.2, repeat: int = 5) -> dict:
+    results = {}
+    for name, fn in cases().items():
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        # autorange ให้เวลาราว 0.2 วินาที ปรับตาม min_time แล้ววัดซ้ำเอาค่าดีที่สุด
+        number = max(1, int(number * min_time / 0.2))
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+        results[f"micro.{name}"] = {"us_per_op": round(best * 1e6, 2), "ops_per_sec": round(1 / best, 1)}
+    return results
@@ -0,0 +1,43 @@
+import math
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    """nearest-rank percentile ของ list ที่เรียงแล้ว"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, elapsed: float, errors: int = 0) -> dict:
+    """สรุป latency (วินาที) เป็น throughput และ p50/p95/p99 หน่วยมิลลิวินาที"""
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float):
+    """เทียบผลกับ baseline คืน list ของ (ชื่อ, metric, ค่าเดิม, ค่าใหม่, % เปลี่ยน, ถดถอยหรือไม่)
+
+    latency สูงขึ้นหรือ throughput ลดลงเกิน threshold (%) ถือว่าถดถอย
+    """
+    rows = []
+    for name, metrics in current.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        for metric, value in metrics.items():
+            before = old.get(metric)
+            if not isinstance(value, (int, float)) or not before or metric in ("requests", "errors"):
+                continue
+            change = (value - before) / before * 100
+            higher_is_better = metric in ("throughput_rps", "ops_per_sec")
+            regressed = (-change if higher_is_better else change) > threshold
+            rows.append((name, metric, before, value, round(change, 1), regressed))
+    return rows
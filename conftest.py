@@ -0,0 +1,12 @@
+import os
+import shutil
+import tempfile
+
+# ให้ engine จริงของแอป (ถ้า test ใดสร้างขึ้น) ใช้ไฟล์ชั่วคราว ไม่เขียนลง app.db ที่อยู่ใน git
+# ต้องตั้งก่อน import app.config
+_tmp_dir = tempfile.mkdtemp(prefix="travel-app-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_dir}/app.db"
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_tmp_dir, ignore_errors=True)